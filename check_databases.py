@@ -1,63 +1,110 @@
 from src.storage.document_store import DocumentStore
-from src.storage.chat_store import ChatStore
-import chromadb
+from contextlib import closing
 import os
+import sqlite3
 from pathlib import Path
 
+
+def _open_ro(path):
+    """Open a SQLite database read-only, tuned for fast inspection queries."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.executescript(
+        "PRAGMA mmap_size=268435456; PRAGMA query_only=1; PRAGMA temp_store=MEMORY;"
+    )
+    return conn
+
+
+def _scan(root):
+    """Recursively yield (name, size) for files under root using cached DirEntry stats."""
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan(entry.path)
+            else:
+                yield entry.name, entry.stat().st_size
+
+
+# Check everything up front so the script observes rather than creates files
+data_dir = Path('.data')
+paths = {
+    "documents": data_dir / "documents.db",
+    "chat": data_dir / "chat_history.db",
+    "chroma": data_dir / "chromadb",
+    "cache": data_dir / "cache",
+    "files": data_dir / "files",
+}
+present = {name: p.exists() for name, p in paths.items()}
+
 print('='*60)
 print('CHECKING ALL DATABASES')
 print('='*60)
 
 # 1. Documents Database
 print('\n1. DOCUMENT DATABASE (documents.db):')
-ds = DocumentStore()
-docs = ds.list_documents()
-print(f'   Total documents: {len(docs)}')
-if docs:
-    for d in docs:
-        print(f'   - ID: {d["id"]}, File: {d["filename"]}')
+if present["documents"]:
+    ds = DocumentStore(str(data_dir))
+    docs = ds.list_documents()
+    print(f'   Total documents: {len(docs)}')
+    if docs:
+        for d in docs:
+            print(f'   - ID: {d["id"]}, File: {d["filename"]}')
+else:
+    print('   Skipped: documents.db does not exist')
 
 # 2. Chat/Secondary Sources Database
 print('\n2. CHAT DATABASE (chat_history.db):')
-data_dir = Path('.data')
-cs = ChatStore(str(data_dir / "chat_history.db"))
 
-# Query database directly
-import sqlite3
-with sqlite3.connect(data_dir / "chat_history.db") as conn:
-    # List all tables
-    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [t[0] for t in cursor.fetchall()]
-    print(f'   Tables: {tables}')
-
-    # Count chat history
-    cursor = conn.execute('SELECT COUNT(*) FROM chat_history')
-    chat_count = cursor.fetchone()[0]
-    print(f'   Chat messages: {chat_count}')
-
-    # Count research summaries
-    cursor = conn.execute('SELECT COUNT(*) FROM research_summaries')
-    summary_count = cursor.fetchone()[0]
-    print(f'   Research summaries: {summary_count}')
-
-    # Show recent summaries if any
-    if summary_count > 0:
-        cursor = conn.execute('SELECT id, title, created_at FROM research_summaries ORDER BY created_at DESC LIMIT 5')
-        print('   Recent summaries:')
-        for row in cursor.fetchall():
-            print(f'     - ID: {row[0]}, Title: "{row[1]}", Created: {row[2]}')
+# Query database directly (read-only, no schema bootstrap)
+if present["chat"]:
+    with closing(_open_ro(paths["chat"])) as conn:
+        cursor = conn.cursor()
+
+        # List all tables
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = [t[0] for t in cursor.fetchall()]
+        print(f'   Tables: {tables}')
+
+        # Count chat history and research summaries in one statement
+        cursor.execute(
+            'SELECT (SELECT COUNT(*) FROM chat_history), (SELECT COUNT(*) FROM research_summaries)'
+        )
+        chat_count, summary_count = cursor.fetchone()
+        print(f'   Chat messages: {chat_count}')
+        print(f'   Research summaries: {summary_count}')
+
+        # Show recent summaries if any
+        cursor.execute('SELECT id, title, created_at FROM research_summaries ORDER BY created_at DESC LIMIT 5')
+        recent = cursor.fetchall()
+        if recent:
+            print('   Recent summaries:')
+            for row in recent:
+                print(f'     - ID: {row[0]}, Title: "{row[1]}", Created: {row[2]}')
+else:
+    print('   Skipped: chat_history.db does not exist')
 
 # 3. ChromaDB
 print('\n3. CHROMADB (.data/chromadb):')
 try:
-    chroma_path = os.path.join('.data', 'chromadb')
-    if os.path.exists(chroma_path):
-        client = chromadb.PersistentClient(path=chroma_path)
-        collections = client.list_collections()
+    chroma_path = paths["chroma"]
+    if present["chroma"]:
+        try:
+            # Read counts straight from Chroma's SQLite catalog to avoid loading HNSW indexes
+            with closing(_open_ro(chroma_path / 'chroma.sqlite3')) as conn:
+                collections = conn.execute("""
+                    SELECT c.name, COUNT(e.id)
+                    FROM collections c
+                    LEFT JOIN segments s ON s.collection = c.id
+                    LEFT JOIN embeddings e ON e.segment_id = s.id
+                    GROUP BY c.id
+                """).fetchall()
+        except sqlite3.Error:
+            # Catalog schema changed - fall back to the full client
+            import chromadb
+            client = chromadb.PersistentClient(path=str(chroma_path))
+            collections = [(col.name, col.count()) for col in client.list_collections()]
         print(f'   Total collections: {len(collections)}')
-        for col in collections:
-            count = col.count()
-            print(f'   - Collection: "{col.name}", Vectors: {count}')
+        for name, count in collections:
+            print(f'   - Collection: "{name}", Vectors: {count}')
     else:
         print('   ChromaDB directory does not exist')
 except Exception as e:
@@ -65,29 +112,27 @@ except Exception as e:
 
 # 4. Cached Files
 print('\n4. CACHED FILES (.data/cache):')
-cache_dir = '.data/cache'
-if os.path.exists(cache_dir):
-    files = [f for f in os.listdir(cache_dir) if os.path.isfile(os.path.join(cache_dir, f))]
+if present["cache"]:
+    with os.scandir(paths["cache"]) as it:
+        files = [(e.name, e.stat().st_size) for e in it if e.is_file()]
     print(f'   Cached files: {len(files)}')
     if files:
-        for f in files[:10]:  # Show first 10
-            size = os.path.getsize(os.path.join(cache_dir, f))
+        for f, size in files[:10]:  # Show first 10
             print(f'   - {f} ({size} bytes)')
 else:
     print('   No cache directory found')
 
 # 5. Uploaded Files
 print('\n5. UPLOADED FILES (.data/files):')
-files_dir = '.data/files'
-if os.path.exists(files_dir):
-    all_files = []
-    for root, dirs, files in os.walk(files_dir):
-        for f in files:
-            full_path = os.path.join(root, f)
-            size = os.path.getsize(full_path)
-            all_files.append((f, size))
-    print(f'   Total files: {len(all_files)}')
-    for f, size in all_files[:10]:
+if present["files"]:
+    count = 0
+    sample = []
+    for name, size in _scan(paths["files"]):
+        count += 1
+        if len(sample) < 10:
+            sample.append((name, size))
+    print(f'   Total files: {count}')
+    for f, size in sample:
         print(f'   - {f} ({size} bytes)')
 else:
     print('   No files directory found')
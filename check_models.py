@@ -18,31 +18,30 @@ if not api_key:
 # Configure the new google.genai client
 client = genai.Client(api_key=api_key)
 
+# Map API action names to display labels once, rather than sniffing per model
+ACTION_LABELS = {
+    'generateContent': "Generate Content",
+    'embedContent': "Embeddings",
+}
+
 print(f"{'Model Name':<50} | {'Capabilities'}")
 print("-" * 80)
 
 try:
-    # 2. List the models using the new API
-    models = client.models.list()
+    # 2. List the models using the new API, fetching large pages to cut round-trips
+    models = client.models.list(config={'page_size': 200})
     
     for model in models:
         name = model.name
+        actions = model.supported_actions or []
         
-        # Check capabilities from the model object
-        capabilities = []
-        
-        # The new API structure is different - models have different properties
-        if hasattr(model, 'supported_generation_methods'):
-            methods = model.supported_generation_methods
-            if 'generateContent' in methods:
-                capabilities.append("Generate Content")
-            if 'embedContent' in methods:
-                capabilities.append("Embeddings")
-        else:
-            # For newer API, check model name patterns
-            if 'embedding' in name.lower():
+        capabilities = [ACTION_LABELS[a] for a in actions if a in ACTION_LABELS]
+        if not actions:
+            # Fall back to model name patterns when actions are not reported
+            lowered = name.lower()
+            if 'embedding' in lowered:
                 capabilities.append("Embeddings")
-            elif 'gemini' in name.lower():
+            elif 'gemini' in lowered:
                 capabilities.append("Generate Content (Text/Image/Video)")
             
         print(f"{name:<50} | {', '.join(capabilities) if capabilities else 'Check documentation'}")
@@ -1,21 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from src.storage.document_store import DocumentStore
 
+
+@lru_cache(maxsize=None)
+def _list(path):
+    """List document ids and filenames for a data folder, memoized per path."""
+    return DocumentStore(path).list_documents(columns=("id", "filename"))
+
+
 print("=" * 60)
 print("COMPARING TWO .data FOLDERS")
 print("=" * 60)
 
+# Both folders are independent SQLite files, so read them concurrently
+with ThreadPoolExecutor(max_workers=2) as pool:
+    docs_root, docs_src = pool.map(_list, [".data", "src/.data"])
+
 # Check ROOT .data
 print("\n1. ROOT .data (D:\\Sweden\\annualReportAnalyser\\.data):")
-ds_root = DocumentStore(".data")
-docs_root = ds_root.list_documents()
 print(f"   Documents: {len(docs_root)}")
 for d in docs_root:
     print(f"   - {d['filename']} (ID: {d['id']})")
 
 # Check SRC .data
 print("\n2. SRC .data (D:\\Sweden\\annualReportAnalyser\\src\\.data):")
-ds_src = DocumentStore("src/.data")
-docs_src = ds_src.list_documents()
 print(f"   Documents: {len(docs_src)}")
 for d in docs_src:
     print(f"   - {d['filename']} (ID: {d['id']})")
@@ -16,8 +16,9 @@ def main():
     os.chdir(src_dir)
     print(f"Working directory set to: {os.getcwd()}")
     
-    # Run streamlit
-    os.system(f"{sys.executable} -m streamlit run app.py")
+    # Run streamlit in-process instead of spawning a second interpreter
+    from streamlit.web import bootstrap
+    bootstrap.run(str(src_dir / "app.py"), is_hello=False, args=sys.argv[1:], flag_options={})
 
 
 if __name__ == "__main__":
@@ -1,35 +1,111 @@
 """
 Chart analyzer using Gemini Vision to interpret charts and graphs.
 """
-from typing import List, Dict, Any, Optional
-import base64
+from typing import List, Dict, Any, Iterator, Optional
+from pathlib import Path
+import asyncio
+import functools
+import hashlib
 import io
 
+import google.ai.generativelanguage as glm
 import google.generativeai as genai
 from PIL import Image
 
+from .event_loop import run_async
+
+
+# Maximum number of concurrent Gemini requests when analyzing multiple charts
+MAX_CONCURRENT_REQUESTS = 8
+
+# Longest image edge Gemini Vision makes use of; larger images only add upload cost
+MAX_IMAGE_EDGE = 1568
+JPEG_QUALITY = 85
+
+
+def _prep(img: Image.Image) -> Image.Image:
+    """Downscale an image and re-encode it as JPEG to shrink the request payload."""
+    img = img.copy()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+    
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+async def _make_async_client(api_key: str) -> glm.GenerativeServiceAsyncClient:
+    """Create the async client from inside the shared loop, which it then stays bound to."""
+    return glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+
+
+@functools.lru_cache(maxsize=8)
+def _get_model(api_key: str, model_name: str) -> genai.GenerativeModel:
+    """
+    Build a GenerativeModel once per key/model pair.
+    
+    The model gets its own clients carrying api_key, rather than relying on the
+    global genai.configure, which other analyzers set with their own keys.
+    """
+    model = genai.GenerativeModel(model_name)
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    model._async_client = run_async(_make_async_client(api_key))
+    return model
+
 
 class ChartAnalyzer:
     """Analyze charts using Gemini Vision."""
     
-    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash"):
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "gemini-2.0-flash",
+        cache_dir: Optional[str] = None
+    ):
         self.api_key = api_key
         self.model_name = model_name
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
-    
-    def analyze_chart(self, image: Image.Image, context: str = "") -> str:
-        """
-        Analyze a single chart image and extract insights.
+        self.model = _get_model(api_key, model_name)
         
-        Args:
-            image: PIL Image of the chart
-            context: Optional context about the fund/report
-            
-        Returns:
-            Text description of the chart's data and insights
-        """
-        prompt = f"""Analyze this chart from a fund annual report. Extract ALL data points, values, and insights.
+        # Responses keyed by image content + prompt + model, optionally persisted to disk
+        self._cache: Dict[str, str] = {}
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _cache_key(self, image: Image.Image, prompt: str) -> str:
+        """Compute a content-addressed cache key for an image/prompt pair."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(image.tobytes())
+        h.update(prompt.encode())
+        h.update(self.model_name.encode())
+        return h.hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return a cached response, checking memory first and then disk."""
+        if key in self._cache:
+            return self._cache[key]
+        if self.cache_dir:
+            path = self.cache_dir / f"{key}.txt"
+            if path.exists():
+                text = path.read_text(encoding="utf-8")
+                self._cache[key] = text
+                return text
+        return None
+    
+    def _cache_set(self, key: str, text: str) -> None:
+        """Store a successful response in the cache."""
+        self._cache[key] = text
+        if self.cache_dir:
+            try:
+                (self.cache_dir / f"{key}.txt").write_text(text, encoding="utf-8")
+            except OSError as e:
+                print(f"Could not write chart cache entry: {e}")
+    
+    def _chart_prompt(self, context: str = "") -> str:
+        """Build the prompt used for single chart analysis."""
+        return f"""Analyze this chart from a fund annual report. Extract ALL data points, values, and insights.
 
 Context: {context if context else "This is from a fund annual report."}
 
@@ -43,40 +119,139 @@ Please provide:
 
 Be precise with numbers - extract exact values from the chart.
 Format as structured text that can be used for writing a fund commentary."""
+    
+    def analyze_chart_stream(self, image: Image.Image, context: str = "") -> Iterator[str]:
+        """
+        Analyze a single chart image, yielding the description as it streams in.
+        
+        Args:
+            image: PIL Image of the chart
+            context: Optional context about the fund/report
+            
+        Yields:
+            Text fragments of the chart's data and insights
+
+        Raises:
+            Exception: If the stream fails after text was already yielded, so the
+                partial description is never mixed with an error message
+        """
+        prompt = self._chart_prompt(context)
+        key = self._cache_key(image, prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+        image = _prep(image)
 
+        parts = []
         try:
-            response = self.model.generate_content([prompt, image])
+            for chunk in self.model.generate_content([prompt, image], stream=True):
+                parts.append(chunk.text)
+                yield chunk.text
+        except Exception as e:
+            if parts:
+                raise
+            yield f"Chart analysis failed: {str(e)}"
+            return
+        
+        self._cache_set(key, "".join(parts))
+    
+    def analyze_chart(self, image: Image.Image, context: str = "") -> str:
+        """
+        Analyze a single chart image and extract insights.
+        
+        Args:
+            image: PIL Image of the chart
+            context: Optional context about the fund/report
+            
+        Returns:
+            Text description of the chart's data and insights
+        """
+        return "".join(self.analyze_chart_stream(image, context))
+    
+    async def _analyze_chart_async(self, image: Image.Image, context: str = "") -> str:
+        """Async variant of analyze_chart using generate_content_async."""
+        prompt = self._chart_prompt(context)
+        key = self._cache_key(image, prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        image = _prep(image)
+        
+        try:
+            response = await self.model.generate_content_async([prompt, image])
+            self._cache_set(key, response.text)
             return response.text
         except Exception as e:
             return f"Chart analysis failed: {str(e)}"
     
-    def analyze_multiple_charts(
+    async def analyze_multiple_charts_async(
         self, 
         images: List[Dict[str, Any]], 
-        context: str = ""
+        context: str = "",
+        max_charts: Optional[int] = None
     ) -> List[str]:
         """
-        Analyze multiple chart images.
+        Analyze multiple chart images concurrently.
         
         Args:
             images: List of image dicts with 'image' (PIL Image) and metadata
             context: Context about the fund
+            max_charts: Optional cap on the number of images analyzed
             
         Returns:
-            List of chart descriptions
+            List of chart descriptions, in input order
         """
-        descriptions = []
+        if max_charts is not None:
+            images = images[:max_charts]
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        async def _analyze(image: Image.Image, page: Any) -> str:
+            async with semaphore:
+                chart_context = f"{context} This chart is from page {page}."
+                return await self._analyze_chart_async(image, chart_context)
         
-        for img_data in images:  # Limit to 5 charts
+        # Identical charts (e.g. repeated legends) are only sent once
+        entries = []
+        unique: Dict[bytes, tuple] = {}
+        for img_data in images:
             image = img_data.get("image")
+            if not image:
+                continue
             page = img_data.get("page", "unknown")
-            
-            if image:
-                chart_context = f"{context} This chart is from page {page}."
-                description = self.analyze_chart(image, chart_context)
-                descriptions.append(f"[Page {page}] {description}")
+            h = hashlib.blake2b(image.tobytes(), digest_size=12).digest()
+            unique.setdefault(h, (image, page))
+            entries.append((h, page))
+        
+        hashes = list(unique)
+        results = await asyncio.gather(*(_analyze(*unique[h]) for h in hashes))
+        by_hash = dict(zip(hashes, results))
         
-        return descriptions
+        return [f"[Page {page}] {by_hash[h]}" for h, page in entries]
+    
+    def analyze_multiple_charts(
+        self, 
+        images: List[Dict[str, Any]], 
+        context: str = "",
+        max_charts: Optional[int] = None
+    ) -> List[str]:
+        """
+        Analyze multiple chart images.
+        
+        Synchronous wrapper around analyze_multiple_charts_async so charts
+        are sent to Gemini in parallel rather than one at a time. Runs on the
+        shared background loop, which the SDK's async client stays bound to.
+        
+        Args:
+            images: List of image dicts with 'image' (PIL Image) and metadata
+            context: Context about the fund
+            max_charts: Optional cap on the number of images analyzed
+            
+        Returns:
+            List of chart descriptions
+        """
+        return run_async(self.analyze_multiple_charts_async(images, context, max_charts))
     
     def analyze_page_for_charts(
         self, 
@@ -101,9 +276,15 @@ Extract ALL numerical data visible on this page:
 6. Any dates, periods, benchmarks mentioned
 
 Be extremely precise with numbers. Format the data clearly."""
+        key = self._cache_key(page_image, prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        page_image = _prep(page_image)
 
         try:
             response = self.model.generate_content([prompt, page_image])
+            self._cache_set(key, response.text)
             return response.text
         except Exception as e:
             return f"Page analysis failed: {str(e)}"
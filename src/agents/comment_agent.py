@@ -1,158 +1,91 @@
 """
 LangChain AgentExecutor for comment generation with tools and memory.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterator, Tuple
+import asyncio
+import functools
+import hashlib
+import io
 import json
+import logging
+import threading
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain.memory import ConversationBufferMemory
-
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from langchain.memory import ConversationBufferWindowMemory
+from langchain.memory.chat_memory import BaseChatMemory
 
 from models.extracted_data import ExtractedData
 from models.comment_params import CommentParameters
+from .event_loop import on_shared_loop, iterate_on_shared_loop
+from .semantic_memory import SemanticWindowMemory
+from .tokens import count_tokens, truncate_to_tokens
 
+logger = logging.getLogger(__name__)
 
-class CommentGeneratorAgent:
-    """Agent for generating comments using LangChain AgentExecutor with tools and memory."""
-    
-    def __init__(
-        self, 
-        api_key: str, 
-        model_name: str = "gemini-2.5-pro", 
-        provider: str = "gemini",
-        vector_store: Optional[Any] = None,
-        document_store: Optional[Any] = None
-    ):
-        self.api_key = api_key
-        self.model_name = model_name
-        self.provider = provider
-        self.vector_store = vector_store
-        self.document_store = document_store
-        self._llm = None
-        self._memory = None
-        self._tools = None
-        self._agent_executor = None
-    
-    @property
-    def llm(self) -> BaseChatModel:
-        """Lazy initialization of LLM."""
-        if self._llm is None:
-            if self.provider == "openai":
-                from langchain_openai import ChatOpenAI
-                self._llm = ChatOpenAI(
-                    model=self.model_name,
-                    api_key=self.api_key,
-                    temperature=0.7,
-                    max_tokens=4096
-                )
-            else:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                self._llm = ChatGoogleGenerativeAI(
-                    model=self.model_name,
-                    google_api_key=self.api_key,
-                    temperature=0.7,
-                    max_output_tokens=4096
-                )
-        return self._llm
-    
-    @property
-    def memory(self) -> ConversationBufferMemory:
-        """Get or create conversation memory."""
-        if self._memory is None:
-            self._memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True,
-                output_key="output"  # Explicitly set to avoid warning with intermediate_steps
-            )
-        return self._memory
-    
-    @property
-    def tools(self) -> List:
-        """Get or create agent tools."""
-        if self._tools is None:
-            self._tools = []
-            
-            if self.vector_store and self.document_store:
-                try:
-                    from agents.tools.search_tools import create_search_tool, create_document_retriever_tool
-                    from agents.tools.table_tools import create_table_query_tool, create_compare_tool
-                    from agents.tools.calculation_tools import create_calculation_tool, create_extract_numbers_tool
-                    
-                    self._tools = [
-                        create_search_tool(self.vector_store),
-                        create_document_retriever_tool(self.vector_store, self.document_store),
-                        create_table_query_tool(self.vector_store, self.document_store),
-                        create_compare_tool(self.vector_store, self.document_store),
-                        create_calculation_tool(),
-                        create_extract_numbers_tool()
-                    ]
-                    
-                    # Add stock tools (current + historical)
-                    try:
-                        from agents.tools.stock_tools import create_stock_tool
-                        stock_tools = create_stock_tool()
-                        if isinstance(stock_tools, list):
-                            self._tools.extend(stock_tools)
-                        else:
-                            self._tools.append(stock_tools)
-                    except ImportError as e:
-                        print(f"Warning: Stock tool not available: {e}")
-                    
-                    # Add URL fetch tool (Docling-based, no storage)
-                    try:
-                        from agents.tools.url_tools import create_url_fetch_tool
-                        self._tools.append(create_url_fetch_tool())
-                    except ImportError as e:
-                        print(f"Warning: URL fetch tool not available: {e}")
-                        
-                except ImportError as e:
-                    print(f"Warning: Could not import agent tools: {e}")
-        
-        return self._tools
-    
-    def _get_agent_executor(self) -> Optional[AgentExecutor]:
-        """Create AgentExecutor with tools and memory."""
-        if self._agent_executor is None and self.tools:
-            # Build system prompt
-            system_prompt = self._get_agent_system_prompt()
-            
-            # Create prompt template with memory placeholder
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt),
-                MessagesPlaceholder(variable_name="chat_history"),
-                ("human", "{input}"),
-                MessagesPlaceholder(variable_name="agent_scratchpad")
-            ])
-            
-            try:
-                # Create agent with tool calling
-                agent = create_tool_calling_agent(self.llm, self.tools, prompt)
-                
-                self._agent_executor = AgentExecutor(
-                    agent=agent,
-                    tools=self.tools,
-                    memory=self.memory,
-                    verbose=True,
-                    max_iterations=100,
-                    handle_parsing_errors=True,
-                    early_stopping_method="generate",
-                    return_intermediate_steps=True  # Enable to debug tool usage
-                )
-            except Exception as e:
-                print(f"Warning: Could not create AgentExecutor: {e}")
-        
-        return self._agent_executor
-    
-    def _get_agent_system_prompt(self) -> str:
-        """Get system prompt for agent mode."""
-        return """You are an expert financial document analyst with access to a document database.
+# Agent tool factories, resolved once at import time
+try:
+    from .tools.search_tools import create_search_tool, create_document_retriever_tool
+    from .tools.table_tools import create_table_query_tool, create_compare_tool
+    from .tools.calculation_tools import create_calculation_tool, create_extract_numbers_tool
+    _TOOLS_IMPORT_ERROR = None
+except ImportError as e:
+    _TOOLS_IMPORT_ERROR = e
+
+try:
+    from .tools.stock_tools import create_stock_tool
+except ImportError as e:
+    create_stock_tool = None
+    _STOCK_TOOL_IMPORT_ERROR = e
+
+try:
+    from .tools.url_tools import create_url_fetch_tool
+except ImportError as e:
+    create_url_fetch_tool = None
+    _URL_TOOL_IMPORT_ERROR = e
+
+
+def _format_holding(i: int, h: Any) -> str:
+    """Format one numbered holding line for the data context."""
+    return (
+        f"  {i}. {h.name}"
+        f"{f' ({h.sector})' if h.sector else ''}: "
+        f"{format(h.weight, '.2f') + '%' if h.weight else 'N/A'}"
+        f"{', contribution: ' + format(h.contribution, '+.2f') + '%' if h.contribution else ''}"
+    )
+
+
+# Chat history roles by message type (system and tool messages are not shown)
+_ROLE_MAP = {HumanMessage: "user", AIMessage: "assistant"}
+
+@functools.lru_cache(maxsize=None)
+def _get_http_clients(max_connections: int):
+    """Create sync and async httpx clients with a pool sized for concurrent requests."""
+    import httpx
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections
+    )
+    return httpx.Client(limits=limits), httpx.AsyncClient(limits=limits)
+
+
+# LLM clients keyed by (provider, model, api key hash, temperature, max tokens, pool size),
+# so agents with the same settings share one client and its connection pool
+_LLM_CACHE: Dict[Tuple, BaseChatModel] = {}
+_LLM_CACHE_LOCK = threading.Lock()
+
+# Built tool lists keyed by (id(vector_store), id(document_store), url_cache_dir).
+# Entries keep the stores alongside, which keeps them alive and lets an id
+# reused by a new object be detected.
+_TOOLS_CACHE: Dict[Tuple[int, int, Optional[str]], Tuple[Any, Any, List]] = {}
+_TOOLS_CACHE_LOCK = threading.Lock()
+
+
+# Static prompt fragments, built once at import time
+_AGENT_SYSTEM_PROMPT = """You are an expert financial document analyst with access to a document database.
 You have conversation memory and can reference previous messages in our chat.
 
 IMPORTANT: You have access to tools - USE THEM for every question about documents!
@@ -209,120 +142,8 @@ Response format:
 - Cite specific facts and numbers from the documents
 - If no relevant data is found, say "I searched but couldn't find information about X"
 - Be helpful and thorough"""
-    
-    def chat(self, message: str, doc_id: Optional[str] = None) -> str:
-        """
-        Chat with the agent about documents.
-        Uses tools to search and retrieve information.
-        """
-        agent_executor = self._get_agent_executor()
-        
-        if not agent_executor:
-            return "Agent not available. Please ensure vector store is configured."
-        
-        # Add document context to message if specified
-        # NOTE: Don't filter by doc_id - let search find all relevant content including secondary sources
-        if doc_id:
-            message = f"[Current document ID for reference: {doc_id} - but search ALL content, don't filter by doc_id unless specifically needed]\n\n{message}"
-        
-        try:
-            result = agent_executor.invoke({"input": message})
-            
-            # Debug: print the full result structure
-            import logging
-            logging.info(f"Agent result type: {type(result)}")
-            logging.info(f"Agent result keys: {result.keys() if isinstance(result, dict) else 'not a dict'}")
-            logging.info(f"Agent result: {result}")
-            
-            # Get output, ensuring we have something to return
-            output = result.get("output", "") if isinstance(result, dict) else str(result)
-            
-            # If output is empty but we have intermediate steps, try to extract something
-            if not output and isinstance(result, dict):
-                intermediate_steps = result.get("intermediate_steps", [])
-                if intermediate_steps:
-                    # Get the last tool response as fallback
-                    last_step = intermediate_steps[-1]
-                    if len(last_step) >= 2:
-                        output = f"Based on the search results:\n\n{last_step[1]}"
-            
-            return output if output else "I couldn't generate a response. Please try rephrasing your question."
-        except Exception as e:
-            import traceback
-            return f"Error: {str(e)}\n\n{traceback.format_exc()}"
-    
-    def clear_memory(self):
-        """Clear conversation memory."""
-        if self._memory:
-            self._memory.clear()
-    
-    def get_chat_history(self) -> List[Dict[str, str]]:
-        """Get conversation history."""
-        if not self._memory:
-            return []
-        
-        messages = self._memory.chat_memory.messages
-        history = []
-        
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                history.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                history.append({"role": "assistant", "content": msg.content})
-        
-        return history
-    
-    def generate(
-        self, 
-        data: ExtractedData, 
-        params: CommentParameters,
-        additional_context: Optional[str] = None
-    ) -> str:
-        """Generate comment based on extracted data and parameters."""
-        
-        # Build the data context
-        data_context = self._build_data_context(data, params)
-        
-        # Add AI-analyzed context if provided
-        if additional_context:
-            data_context = f"{data_context}\n\n=== AI-ANALYZED CONTENT ===\n{additional_context}\n=== END AI-ANALYZED CONTENT ==="
-        
-        # Build the user prompt
-        user_prompt = self._build_user_prompt(params, data_context)
-        
-        # Check if we have an agent executor with tools
-        agent_executor = self._get_agent_executor()
-        
-        if agent_executor and self.tools:
-            # Use agent with tools
-            try:
-                result = agent_executor.invoke({"input": user_prompt})
-                return result.get("output", str(result))
-            except Exception as e:
-                print(f"Agent execution failed, falling back to chain: {e}")
-                # Fallback to simple chain
-                return self._generate_with_chain(params, data_context)
-        else:
-            # Use simple chain (original behavior)
-            return self._generate_with_chain(params, data_context)
-    
-    def _generate_with_chain(self, params: CommentParameters, data_context: str) -> str:
-        """Generate using simple chain (fallback mode)."""
-        system_prompt = self._build_system_prompt(params)
-        user_prompt = self._build_user_prompt(params, data_context)
-        
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        return chain.invoke({})
-    
-    def _build_system_prompt(self, params: CommentParameters) -> str:
-        """Build system prompt based on comment type."""
-        
-        base_prompt = """You are an expert financial writer specializing in asset management communications. 
+
+_BASE_SYSTEM_PROMPT = """You are an expert financial writer specializing in asset management communications. 
 Your task is to write professional fund commentary based STRICTLY on the provided data from the annual report.
 
 CRITICAL RULES - YOU MUST FOLLOW THESE:
@@ -341,9 +162,9 @@ Key principles:
 - Maintain consistent tone throughout
 - Quote specific data points from tables when relevant
 """
-        
-        type_specific = {
-            "asset_manager_comment": """
+
+_TYPE_SPECIFIC_GUIDANCE = {
+    "asset_manager_comment": """
 You are writing an Asset Manager Comment for a fund's official report. This should:
 - Open with a brief market context
 - Discuss fund performance vs benchmark
@@ -351,73 +172,501 @@ You are writing an Asset Manager Comment for a fund's official report. This shou
 - Explain any significant portfolio changes
 - Provide a brief outlook
 """,
-            "performance_summary": """
+    "performance_summary": """
 You are writing a Performance Summary. This should:
 - Focus primarily on quantitative performance data
 - Compare fund returns to benchmark clearly
 - Break down attribution by sector or holdings
 - Be concise and data-driven
 """,
-            "risk_analysis": """
+    "risk_analysis": """
 You are writing a Risk Analysis. This should:
 - Discuss risk metrics and volatility
 - Analyze drawdowns and recovery
 - Compare risk-adjusted returns
 - Highlight portfolio concentration risks
 """,
-            "sustainability_report": """
+    "sustainability_report": """
 You are writing a Sustainability/ESG Report. This should:
 - Focus on ESG metrics and scores
 - Discuss sustainability initiatives
 - Highlight green investments
 - Report on carbon footprint if available
 """,
-            "newsletter_excerpt": """
+    "newsletter_excerpt": """
 You are writing a Newsletter Excerpt for retail investors. This should:
 - Use accessible, jargon-free language
 - Tell a compelling story about the fund
 - Be engaging and easy to read
 - Highlight key takeaways simply
 """,
-            "custom": """
+    "custom": """
 You are writing a custom financial commentary. Follow the specific instructions provided carefully.
 """
-        }
+}
+
+_TONE_GUIDANCE = {
+    "formal": "Use formal, professional language appropriate for institutional investors.",
+    "conversational": "Use a friendly, conversational tone while maintaining professionalism.",
+    "technical": "Use technical financial terminology appropriate for sophisticated investors."
+}
+
+_LENGTH_GUIDANCE = {
+    "brief": "Keep the response concise, around 100 words.",
+    "medium": "Write a moderate-length response, around 200 words.",
+    "detailed": "Write a comprehensive response, around 400 words with detailed analysis."
+}
+
+# Prompt templates are built once and reused by every agent
+_AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _AGENT_SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad")
+])
+
+# System and user prompts are passed as variables so the template never changes
+_CHAIN_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "{system}"),
+    ("human", "{input}")
+])
+
+
+class CommentGeneratorAgent:
+    """Agent for generating comments using LangChain AgentExecutor with tools and memory."""
+    
+    def __init__(
+        self, 
+        api_key: str, 
+        model_name: str = "gemini-2.5-pro", 
+        provider: str = "gemini",
+        vector_store: Optional[Any] = None,
+        document_store: Optional[Any] = None,
+        memory_window: int = 6,
+        max_iterations: int = 10,
+        max_execution_time: Optional[float] = 60,
+        debug: bool = False,
+        max_context_tokens: int = 6000,
+        memory_strategy: str = "window",
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        max_connections: int = 64,
+        url_cache_dir: Optional[str] = None
+    ):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.provider = provider
+        self.vector_store = vector_store
+        self.document_store = document_store
+        self.memory_window = memory_window  # Number of recent turns sent to the LLM
+        self.max_iterations = max_iterations
+        self.max_execution_time = max_execution_time  # Seconds per agent call
+        self.debug = debug  # Verbose agent output and intermediate steps
+        self.max_context_tokens = max_context_tokens  # Token budget for _build_data_context
+        self.memory_strategy = memory_strategy  # "window" or "semantic"
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_connections = max_connections  # HTTP pool size shared by OpenAI clients
+        self.url_cache_dir = url_cache_dir  # On-disk cache for the URL fetch tool, off if None
+        self._llm = None
+        self._memory = None
+        self._tools = None
+        self._agent_executor = None
+        self._chain = None
+        # Without both stores there are no tools, so the agent path is never used
+        self._tools_disabled = vector_store is None or document_store is None
+        self._agent_resolved = False
+    
+    @property
+    def llm(self) -> BaseChatModel:
+        """Lazy initialization of LLM, shared across agents with the same settings."""
+        if self._llm is None:
+            key = (
+                self.provider,
+                self.model_name,
+                hashlib.sha256(self.api_key.encode()).hexdigest(),
+                self.temperature,
+                self.max_tokens,
+                self.max_connections
+            )
+            with _LLM_CACHE_LOCK:
+                self._llm = _LLM_CACHE.get(key)
+                if self._llm is None:
+                    self._llm = self._create_llm()
+                    _LLM_CACHE[key] = self._llm
+        return self._llm
+    
+    def _create_llm(self) -> BaseChatModel:
+        """Create a new LLM client for this agent's provider."""
+        if self.provider == "openai":
+            from langchain_openai import ChatOpenAI
+            http_client, http_async_client = _get_http_clients(self.max_connections)
+            return ChatOpenAI(
+                model=self.model_name,
+                api_key=self.api_key,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                http_client=http_client,
+                http_async_client=http_async_client
+            )
         
-        tone_guidance = {
-            "formal": "Use formal, professional language appropriate for institutional investors.",
-            "conversational": "Use a friendly, conversational tone while maintaining professionalism.",
-            "technical": "Use technical financial terminology appropriate for sophisticated investors."
-        }
+        # The Gemini client manages its own transport and takes no httpx client
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model=self.model_name,
+            google_api_key=self.api_key,
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens
+        )
+    
+    @property
+    def memory(self) -> BaseChatMemory:
+        """
+        Get or create conversation memory.
+        
+        "window" keeps the last memory_window turns; "semantic" keeps the last
+        turns plus older turns most relevant to the query (needs a vector store
+        for embeddings).
+        """
+        if self._memory is None:
+            if self.memory_strategy == "semantic" and self.vector_store is not None:
+                self._memory = SemanticWindowMemory(
+                    embeddings=self.vector_store.embeddings,
+                    memory_key="chat_history",
+                    return_messages=True,
+                    output_key="output"
+                )
+            else:
+                self._memory = ConversationBufferWindowMemory(
+                    k=self.memory_window,
+                    memory_key="chat_history",
+                    return_messages=True,
+                    output_key="output"  # Explicitly set to avoid warning with intermediate_steps
+                )
+        return self._memory
+    
+    @property
+    def tools(self) -> List:
+        """Get or create agent tools, shared across agents using the same stores and URL cache."""
+        if self._tools is None:
+            self._tools = []
+            
+            if self.vector_store and self.document_store:
+                key = (id(self.vector_store), id(self.document_store), self.url_cache_dir)
+                with _TOOLS_CACHE_LOCK:
+                    cached = _TOOLS_CACHE.get(key)
+                    if cached and cached[0] is self.vector_store and cached[1] is self.document_store:
+                        self._tools = cached[2]
+                    else:
+                        self._tools = self._build_tools()
+                        if self._tools:
+                            _TOOLS_CACHE[key] = (self.vector_store, self.document_store, self._tools)
+        
+        return self._tools
+    
+    def _build_tools(self) -> List:
+        """Construct the agent tool list for this agent's stores."""
+        if _TOOLS_IMPORT_ERROR is not None:
+            logger.warning("Could not import agent tools: %s", _TOOLS_IMPORT_ERROR)
+            return []
+        
+        tools = [
+            create_search_tool(self.vector_store),
+            create_document_retriever_tool(self.vector_store, self.document_store),
+            create_table_query_tool(self.vector_store, self.document_store),
+            create_compare_tool(self.vector_store, self.document_store),
+            create_calculation_tool(),
+            create_extract_numbers_tool()
+        ]
+        
+        # Add stock tools (current + historical)
+        if create_stock_tool is not None:
+            stock_tools = create_stock_tool()
+            if isinstance(stock_tools, list):
+                tools.extend(stock_tools)
+            else:
+                tools.append(stock_tools)
+        else:
+            logger.warning("Stock tool not available: %s", _STOCK_TOOL_IMPORT_ERROR)
+        
+        # Add URL fetch tool (Docling-based, no storage)
+        if create_url_fetch_tool is not None:
+            tools.append(create_url_fetch_tool(self.url_cache_dir))
+        else:
+            logger.warning("URL fetch tool not available: %s", _URL_TOOL_IMPORT_ERROR)
+        
+        return tools
+    
+    def _get_agent_executor(self) -> Optional[AgentExecutor]:
+        """
+        Create AgentExecutor with tools and memory.
+        
+        The agent-vs-chain decision is resolved on the first call; if the
+        executor cannot be built, later calls go straight to the chain
+        instead of retrying tool and agent construction every time.
+        """
+        if self._agent_resolved:
+            return self._agent_executor
+        self._agent_resolved = True
+        
+        if not self._tools_disabled and self.tools:
+            try:
+                # Create agent with tool calling
+                agent = create_tool_calling_agent(self.llm, self.tools, _AGENT_PROMPT)
+                
+                self._agent_executor = AgentExecutor(
+                    agent=agent,
+                    tools=self.tools,
+                    memory=self.memory,
+                    verbose=self.debug,
+                    max_iterations=self.max_iterations,
+                    max_execution_time=self.max_execution_time,
+                    handle_parsing_errors=True,
+                    early_stopping_method="force",
+                    return_intermediate_steps=self.debug  # Enable to debug tool usage
+                )
+            except Exception as e:
+                logger.warning("Could not create AgentExecutor: %s", e)
+        
+        return self._agent_executor
+    
+    def _get_agent_system_prompt(self) -> str:
+        """Get system prompt for agent mode."""
+        return _AGENT_SYSTEM_PROMPT
+    
+    def _prepare_chat_message(self, message: str, doc_id: Optional[str] = None) -> str:
+        """Add document context to a chat message if specified."""
+        # NOTE: Don't filter by doc_id - let search find all relevant content including secondary sources
+        if doc_id:
+            message = f"[Current document ID for reference: {doc_id} - but search ALL content, don't filter by doc_id unless specifically needed]\n\n{message}"
+        return message
+    
+    def _extract_chat_output(self, result: Any) -> str:
+        """Extract the response text from an agent result."""
+        # Debug: log the full result structure
+        if self.debug:
+            logger.debug("Agent result keys: %s", result.keys() if isinstance(result, dict) else type(result))
+            logger.debug("Agent result: %s", result)
+        
+        # Get output, ensuring we have something to return
+        output = result.get("output", "") if isinstance(result, dict) else str(result)
+        
+        # If output is empty but we have intermediate steps (debug only), try to extract something
+        if not output and isinstance(result, dict):
+            intermediate_steps = result.get("intermediate_steps", [])
+            if intermediate_steps:
+                # Get the last tool response as fallback
+                last_step = intermediate_steps[-1]
+                if len(last_step) >= 2:
+                    output = f"Based on the search results:\n\n{last_step[1]}"
+        
+        return output if output else "I couldn't generate a response. Please try rephrasing your question."
+    
+    def chat(self, message: str, doc_id: Optional[str] = None) -> str:
+        """
+        Chat with the agent about documents.
+        Uses tools to search and retrieve information.
+        """
+        agent_executor = self._get_agent_executor()
+        
+        if not agent_executor:
+            return "Agent not available. Please ensure vector store is configured."
+        
+        message = self._prepare_chat_message(message, doc_id)
+        
+        try:
+            result = agent_executor.invoke({"input": message})
+        except Exception as e:
+            logger.exception("Agent invoke failed")
+            return f"Error: {e}"
+        
+        return self._extract_chat_output(result)
+    
+    async def achat(self, message: str, doc_id: Optional[str] = None) -> str:
+        """
+        Async version of chat using the agent's native async path.
+        
+        Runs on the shared background loop, which the cached HTTP clients are bound to.
+        """
+        return await on_shared_loop(self._achat(message, doc_id))
+    
+    async def _achat(self, message: str, doc_id: Optional[str] = None) -> str:
+        """Body of achat, run on the shared loop."""
+        agent_executor = self._get_agent_executor()
+        
+        if not agent_executor:
+            return "Agent not available. Please ensure vector store is configured."
+        
+        message = self._prepare_chat_message(message, doc_id)
         
-        length_guidance = {
-            "brief": "Keep the response concise, around 100 words.",
-            "medium": "Write a moderate-length response, around 200 words.",
-            "detailed": "Write a comprehensive response, around 400 words with detailed analysis."
+        try:
+            result = await agent_executor.ainvoke({"input": message})
+        except Exception as e:
+            logger.exception("Agent invoke failed")
+            return f"Error: {e}"
+        
+        return self._extract_chat_output(result)
+    
+    def clear_memory(self):
+        """Clear conversation memory."""
+        if self._memory:
+            self._memory.clear()
+    
+    def get_chat_history(self) -> List[Dict[str, str]]:
+        """Get conversation history."""
+        if not self._memory:
+            return []
+        
+        return [
+            {"role": _ROLE_MAP[type(msg)], "content": msg.content}
+            for msg in self._memory.chat_memory.messages
+            if type(msg) in _ROLE_MAP
+        ]
+    
+    def _prepare_generation(
+        self,
+        data: ExtractedData,
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> tuple[str, str]:
+        """Build the data context and user prompt for a generation request."""
+        # Build the data context
+        data_context = self._build_data_context(data, params)
+        
+        # Add AI-analyzed context if provided
+        if additional_context:
+            data_context = f"{data_context}\n\n=== AI-ANALYZED CONTENT ===\n{additional_context}\n=== END AI-ANALYZED CONTENT ==="
+        
+        # Build the user prompt
+        user_prompt = self._build_user_prompt(params, data_context)
+        return data_context, user_prompt
+    
+    def stream(
+        self,
+        data: ExtractedData,
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> Iterator[str]:
+        """Generate comment, yielding text as soon as it is available."""
+        data_context, user_prompt = self._prepare_generation(data, params, additional_context)
+        
+        # Check if we have an agent executor with tools
+        agent_executor = self._get_agent_executor()
+        
+        if agent_executor:
+            # Use agent with tools; the final answer arrives in the "output" chunk
+            try:
+                for chunk in agent_executor.stream({"input": user_prompt}):
+                    if "output" in chunk:
+                        yield chunk["output"]
+                return
+            except Exception as e:
+                logger.warning("Agent execution failed, falling back to chain: %s", e)
+        
+        # Use simple chain (original behavior), streaming tokens
+        yield from self.chain.stream(self._chain_inputs(params, data_context))
+    
+    async def astream(
+        self,
+        data: ExtractedData,
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Async version of stream.
+        
+        Runs on the shared background loop, which the cached HTTP clients are bound to.
+        """
+        async for chunk in iterate_on_shared_loop(self._astream(data, params, additional_context)):
+            yield chunk
+    
+    async def _astream(
+        self,
+        data: ExtractedData,
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Body of astream, run on the shared loop."""
+        data_context, user_prompt = self._prepare_generation(data, params, additional_context)
+        
+        agent_executor = self._get_agent_executor()
+        
+        if agent_executor:
+            try:
+                async for chunk in agent_executor.astream({"input": user_prompt}):
+                    if "output" in chunk:
+                        yield chunk["output"]
+                return
+            except Exception as e:
+                logger.warning("Agent execution failed, falling back to chain: %s", e)
+        
+        async for chunk in self.chain.astream(self._chain_inputs(params, data_context)):
+            yield chunk
+    
+    def generate(
+        self, 
+        data: ExtractedData, 
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """Generate comment based on extracted data and parameters."""
+        return "".join(self.stream(data, params, additional_context))
+    
+    @property
+    def chain(self):
+        """Get or create the prompt | llm | parser chain (fallback mode)."""
+        if self._chain is None:
+            self._chain = _CHAIN_PROMPT | self.llm | StrOutputParser()
+        return self._chain
+    
+    def _chain_inputs(self, params: CommentParameters, data_context: str) -> Dict[str, str]:
+        """Build the input variables for the fallback chain."""
+        return {
+            "system": self._build_system_prompt(params),
+            "input": self._build_user_prompt(params, data_context)
         }
+    
+    def _generate_with_chain(self, params: CommentParameters, data_context: str) -> str:
+        """Generate using simple chain (fallback mode)."""
+        return self.chain.invoke(self._chain_inputs(params, data_context))
+    
+    async def _generate_with_chain_async(self, params: CommentParameters, data_context: str) -> str:
+        """Async version of _generate_with_chain."""
+        return await self.chain.ainvoke(self._chain_inputs(params, data_context))
+    
+    def _build_system_prompt(self, params: CommentParameters) -> str:
+        """Build system prompt based on comment type."""
         
-        return f"""{base_prompt}
-
-{type_specific.get(params.comment_type, type_specific["custom"])}
+        # Keep the shared base prompt as a byte-identical prefix so providers
+        # can reuse their prompt-prefix cache; per-request guidance goes last.
+        suffix = f"""
+{_TYPE_SPECIFIC_GUIDANCE.get(params.comment_type, _TYPE_SPECIFIC_GUIDANCE["custom"])}
 
-Tone: {tone_guidance.get(params.tone, tone_guidance["formal"])}
-Length: {length_guidance.get(params.length, length_guidance["medium"])}
+Tone: {_TONE_GUIDANCE.get(params.tone, _TONE_GUIDANCE["formal"])}
+Length: {_LENGTH_GUIDANCE.get(params.length, _LENGTH_GUIDANCE["medium"])}
 """
+        return _BASE_SYSTEM_PROMPT + "\n" + suffix
     
     def _build_data_context(self, data: ExtractedData, params: CommentParameters) -> str:
-        """Build structured data context for the prompt."""
+        """
+        Build structured data context for the prompt.
         
-        context_parts = []
+        Sections are added in priority order while they fit within
+        max_context_tokens; the raw document text fills what is left.
+        """
+        sections = []
         
         # Fund info
+        fund_lines = []
         if data.fund_name:
-            context_parts.append(f"Fund Name: {data.fund_name}")
+            fund_lines.append(f"Fund Name: {data.fund_name}")
         if data.report_period:
-            context_parts.append(f"Report Period: {data.report_period}")
+            fund_lines.append(f"Report Period: {data.report_period}")
         if data.benchmark_index and params.compare_benchmark:
-            context_parts.append(f"Benchmark: {data.benchmark_index}")
+            fund_lines.append(f"Benchmark: {data.benchmark_index}")
         if data.currency:
-            context_parts.append(f"Currency: {data.currency}")
+            fund_lines.append(f"Currency: {data.currency}")
+        sections.append(fund_lines)
         
         # Performance data
         if data.performance:
@@ -431,55 +680,80 @@ Length: {length_guidance.get(params.length, length_guidance["medium"])}
                 perf_lines.append(f"  Outperformance: {perf.outperformance:+.2f}%")
             if perf.period:
                 perf_lines.append(f"  Period: {perf.period}")
-            context_parts.extend(perf_lines)
+            sections.append(perf_lines)
         
         # Holdings
         if data.holdings and params.top_n_holdings > 0:
             top_holdings = data.holdings[:params.top_n_holdings]
             holdings_lines = ["", f"Top {len(top_holdings)} Holdings:"]
-            for i, h in enumerate(top_holdings, 1):
-                weight_str = f"{h.weight:.2f}%" if h.weight else "N/A"
-                contrib_str = f", contribution: {h.contribution:+.2f}%" if h.contribution else ""
-                sector_str = f" ({h.sector})" if h.sector else ""
-                holdings_lines.append(f"  {i}. {h.name}{sector_str}: {weight_str}{contrib_str}")
-            context_parts.extend(holdings_lines)
+            holdings_lines.extend(map(_format_holding, range(1, len(top_holdings) + 1), top_holdings))
+            sections.append(holdings_lines)
         
         # Sectors
         if data.sectors and params.include_sector_impact:
             sector_lines = ["", "Sector Allocation:"]
             for s in data.sectors[:8]:
                 sector_lines.append(f"  {s.sector}: {s.weight:.1f}%")
-            context_parts.extend(sector_lines)
+            sections.append(sector_lines)
         
         # RAW TABLES - Include all extracted tables
         if data.raw_tables:
-            context_parts.append("\n\n=== RAW TABLES FROM DOCUMENT ===")
+            table_lines = ["\n\n=== RAW TABLES FROM DOCUMENT ==="]
             for table in data.raw_tables[:10]:  # Limit to 10 tables
-                context_parts.append(f"\nTable (Page {table.page}, Type: {table.table_type}):")
+                table_lines.append(f"\nTable (Page {table.page}, Type: {table.table_type}):")
                 if table.headers:
-                    context_parts.append(f"  Headers: {' | '.join(table.headers)}")
-                for row in table.rows[:15]:  # Limit rows per table
-                    context_parts.append(f"  {' | '.join(str(cell) for cell in row)}")
-            context_parts.append("=== END TABLES ===")
+                    table_lines.append("  Headers: " + " | ".join(table.headers))
+                table_lines.extend(
+                    "  " + " | ".join(map(str, row))
+                    for row in table.rows[:15]  # Limit rows per table
+                )
+            table_lines.append("=== END TABLES ===")
+            sections.append(table_lines)
         
         # Chart descriptions
         if data.chart_descriptions:
             chart_lines = ["", "Charts Found:"]
             for desc in data.chart_descriptions[:5]:
                 chart_lines.append(f"  - {desc}")
-            context_parts.extend(chart_lines)
-        
-        # ALWAYS include raw text for context (larger excerpt)
-        if data.raw_text:
-            # Include more text - up to 8000 chars for better context
-            excerpt = data.raw_text[:8000]
-            context_parts.append(f"\n\n=== DOCUMENT TEXT ===\n{excerpt}\n=== END DOCUMENT TEXT ===")
-        
-        return "\n".join(context_parts)
+            sections.append(chart_lines)
+        
+        # Add sections in priority order, skipping any that no longer fit
+        buf = io.StringIO()
+        remaining = self.max_context_tokens
+        for lines in sections:
+            if not lines:
+                continue
+            section = "\n".join(lines)
+            cost = count_tokens(section)
+            if cost <= remaining:
+                if buf.tell():
+                    buf.write("\n")
+                buf.write(section)
+                remaining -= cost
+        
+        # Fill the remaining budget with raw text
+        if data.raw_text and remaining > 0:
+            excerpt = self._fit_raw_text(data.raw_text, remaining)
+            if excerpt:
+                if buf.tell():
+                    buf.write("\n")
+                buf.write("\n\n=== DOCUMENT TEXT ===\n")
+                buf.write(excerpt)
+                buf.write("\n=== END DOCUMENT TEXT ===")
+        
+        return buf.getvalue()
+    
+    def _fit_raw_text(self, raw_text: str, budget: int) -> str:
+        """Return the longest prefix of raw_text whose wrapped section fits in budget tokens."""
+        overhead = count_tokens("\n\n=== DOCUMENT TEXT ===\n\n=== END DOCUMENT TEXT ===")
+        if budget <= overhead:
+            return ""
+        return truncate_to_tokens(raw_text, budget - overhead)
     
     def _build_user_prompt(self, params: CommentParameters, data_context: str) -> str:
         """Build the user prompt."""
         
+        # Fixed boilerplate first, then the data, then per-request instructions
         prompt_parts = [
             "Based on the following fund data, please write the requested commentary.",
             "",
@@ -510,7 +784,69 @@ Length: {length_guidance.get(params.length, length_guidance["medium"])}
     async def generate_async(
         self, 
         data: ExtractedData, 
-        params: CommentParameters
+        params: CommentParameters,
+        additional_context: Optional[str] = None
     ) -> str:
-        """Async version of generate."""
-        return self.generate(data, params)
+        """
+        Async version of generate using LangChain's ainvoke.
+        
+        Runs on the shared background loop, which the cached HTTP clients are bound to.
+        """
+        return await on_shared_loop(self._generate_async(data, params, additional_context))
+    
+    async def _generate_async(
+        self, 
+        data: ExtractedData, 
+        params: CommentParameters,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """Body of generate_async, run on the shared loop."""
+        data_context, user_prompt = self._prepare_generation(data, params, additional_context)
+        
+        agent_executor = self._get_agent_executor()
+        
+        if agent_executor:
+            try:
+                result = await agent_executor.ainvoke({"input": user_prompt})
+                return result.get("output", str(result))
+            except Exception as e:
+                logger.warning("Agent execution failed, falling back to chain: %s", e)
+                return await self._generate_with_chain_async(params, data_context)
+        else:
+            return await self._generate_with_chain_async(params, data_context)
+    
+    async def generate_batch_async(
+        self,
+        items: List[Tuple[ExtractedData, CommentParameters]],
+        max_concurrency: int = 8
+    ) -> List[str]:
+        """
+        Generate comments for several documents concurrently.
+        
+        Items go through the memory-less chain rather than the agent, whose
+        shared executor and chat memory would mix the documents' turns.
+        
+        Args:
+            items: List of (data, params) pairs
+            max_concurrency: Maximum number of in-flight LLM requests
+            
+        Returns:
+            List of generated comments, in input order
+        """
+        # Run on the shared background loop, which the cached HTTP clients are bound to
+        return await on_shared_loop(self._generate_batch_async(items, max_concurrency))
+    
+    async def _generate_batch_async(
+        self,
+        items: List[Tuple[ExtractedData, CommentParameters]],
+        max_concurrency: int
+    ) -> List[str]:
+        """Body of generate_batch_async, run on the shared loop."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(data: ExtractedData, params: CommentParameters) -> str:
+            data_context = self._build_data_context(data, params)
+            async with semaphore:
+                return await self._generate_with_chain_async(params, data_context)
+        
+        return list(await asyncio.gather(*(_one(d, p) for d, p in items)))
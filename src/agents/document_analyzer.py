@@ -1,10 +1,202 @@
 """
 Document Analyzer Agent - Analyzes entire document and returns structured content discovery.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timezone
+from pathlib import Path
+from collections import Counter
+import copy
+import hashlib
 import json
+import re
+import time
 
 import google.generativeai as genai
+from pydantic import ValidationError
+
+from models.document_analysis import DocumentAnalysisSchema
+from .event_loop import run_async
+from .tokens import truncate_to_tokens
+
+try:
+    import orjson  # installed with langsmith; much faster than stdlib json
+except ImportError:
+    orjson = None
+
+try:
+    from blake3 import blake3  # SIMD hashing for large texts and images
+except ImportError:
+    blake3 = None
+
+
+# Bump when the analysis or chart prompts change so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Documents with less text than this and no tables are not sent to the model
+MIN_RAW_TEXT_CHARS = 200
+
+# Token budget for the document text in the analysis prompt
+MAX_RAW_TEXT_TOKENS = 6000
+
+# Only this many tables, and rows per table, are shown to the model
+MAX_PROMPT_TABLES = 15
+MAX_PROMPT_ROWS = 10
+
+# Initial request plus retries that feed the parse/validation error back to the model
+MAX_ANALYSIS_ATTEMPTS = 3
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON from str or bytes, preferring orjson."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, preferring orjson."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option, default=str)
+    return json.dumps(obj, sort_keys=sort_keys, default=str).encode()
+
+
+# Returned (as a copy) when the document cannot be analyzed
+_FALLBACK_STRUCTURE: Dict[str, Any] = {
+    "fund_info": {
+        "name": None,
+        "benchmark": None,
+        "currency": None,
+        "report_period": None,
+        "report_type": None
+    },
+    "sections": [],
+    "tables": [],
+    "charts": [],
+    "companies": [],
+    "metrics": [],
+    "time_periods": [],
+    "themes": [],
+    "key_insights": ["Document analysis could not extract structured data. Using raw text for generation."]
+}
+
+_PAGE_NUMBER_RE = re.compile(r"^\s*\d+\s*$")
+
+
+def _compress_raw_text(raw_text: str, max_tokens: int) -> str:
+    """
+    Drop low-information lines from raw_text, then truncate it to max_tokens.
+
+    Removes bare page numbers, runs of identical lines, and repeats of short
+    lines that occur on many pages (running headers and footers).
+    """
+    lines = raw_text.splitlines()
+    counts = Counter(line.strip() for line in lines)
+    
+    kept = []
+    seen = set()
+    previous = None
+    for line in lines:
+        stripped = line.strip()
+        if _PAGE_NUMBER_RE.match(line) or stripped == previous:
+            continue
+        previous = stripped
+        if stripped and len(stripped) < 80 and counts[stripped] >= 3:
+            if stripped in seen:
+                continue
+            seen.add(stripped)
+        kept.append(line)
+    
+    return truncate_to_tokens("\n".join(kept), max_tokens)
+
+
+def _find_json_span(text: str, pos: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Return the (start, end) of the first balanced {...} or [...] in text at or after pos.
+
+    Walks the string once, tracking bracket depth and skipping brackets
+    inside JSON strings.
+    """
+    start = -1
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(pos, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            if depth:
+                in_string = True
+        elif ch in "{[":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch in "}]" and depth:
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+
+class ExtractionCache:
+    """
+    Content-addressed JSON cache for analysis results.
+
+    Each entry is stored as {cache_dir}/{key}.json together with the model
+    name and the time it was written.
+    """
+    
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def make_key(*parts: bytes) -> str:
+        """
+        Hash the given parts, length-prefixed so adjacent parts cannot run together.
+        
+        The key is prefixed with the hash algorithm so BLAKE3 and SHA-256
+        entries never collide.
+        """
+        if blake3 is not None:
+            h, algorithm = blake3(), "blake3"
+        else:
+            h, algorithm = hashlib.sha256(), "sha256"
+        for part in parts:
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return f"{algorithm}-{h.hexdigest()}"
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or unreadable."""
+        path = self.cache_dir / f"{key}.json"
+        try:
+            entry = _json_loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        # Revalidate: entries written by another prompt version are ignored
+        if not isinstance(entry, dict) or entry.get("prompt_version") != PROMPT_VERSION:
+            return None
+        return entry.get("value")
+    
+    def put(self, key: str, value: Any, model_name: str) -> None:
+        """Store a value under key."""
+        entry = {
+            "model_name": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "value": value,
+        }
+        try:
+            (self.cache_dir / f"{key}.json").write_bytes(_json_dumps(entry))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not write analysis cache entry: {e}")
 
 
 class DocumentAnalyzerAgent:
@@ -13,11 +205,23 @@ class DocumentAnalyzerAgent:
     This enables dynamic UI generation based on actual document contents.
     """
     
-    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash"):
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "gemini-2.0-flash",
+        cache_dir: Optional[str] = None
+    ):
         self.api_key = api_key
         self.model_name = model_name
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel(model_name)
+        self.cache = ExtractionCache(cache_dir) if cache_dir else None
+    
+    def _cache_key(self, kind: str, *parts: bytes) -> str:
+        """Build a cache key scoped to the model and prompt version."""
+        return ExtractionCache.make_key(
+            kind.encode(), self.model_name.encode(), PROMPT_VERSION.encode(), *parts
+        )
     
     def analyze_document(
         self, 
@@ -37,45 +241,102 @@ class DocumentAnalyzerAgent:
         - time_periods: Time periods mentioned
         - themes: Key themes/topics
         """
+        # Nothing worth analyzing (blank or stub PDF) - skip the LLM call
+        if (not raw_text or len(raw_text.strip()) < MIN_RAW_TEXT_CHARS) and not tables_data:
+            return self._get_fallback_structure()
+        
+        key = None
+        if self.cache:
+            key = self._cache_key(
+                "document",
+                raw_text.encode(),
+                _json_dumps(tables_data, sort_keys=True),
+                *(self._image_bytes(img) for img in chart_images or [])
+            )
+            cached = self.cache.get(key)
+            if isinstance(cached, dict):
+                return cached
         
         # Build the analysis prompt
         prompt = self._build_analysis_prompt(raw_text, tables_data)
         
+        # Last response that parsed as a JSON object but failed validation;
+        # still better than the fallback if the retries do not fix it
+        last_parsed = None
+        contents = [{"role": "user", "parts": [prompt]}]
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text
+            response = self.model.generate_content(contents)
             
-            # Parse JSON from response
-            json_content = self._extract_json(result_text)
+            for attempt in range(MAX_ANALYSIS_ATTEMPTS):
+                result_text = response.text
+                
+                # Parse and validate JSON from response
+                json_content = self._extract_json(result_text)
+                if json_content is None:
+                    error = "the response was not valid JSON"
+                else:
+                    try:
+                        DocumentAnalysisSchema.model_validate(json_content)
+                        if key:
+                            self.cache.put(key, json_content, self.model_name)
+                        return json_content
+                    except ValidationError as e:
+                        error = str(e)
+                        if isinstance(json_content, dict):
+                            last_parsed = json_content
+                
+                if attempt == MAX_ANALYSIS_ATTEMPTS - 1:
+                    break
+                
+                # Feed the error back as a follow-up turn so the model can
+                # correct its own output
+                time.sleep(1.0 * (attempt + 1))
+                contents += [
+                    {"role": "model", "parts": [result_text]},
+                    {"role": "user", "parts": [f"Your output had error: {error}. Fix and retry."]},
+                ]
+                response = self.model.generate_content(contents)
             
-            if json_content:
-                return json_content
-            else:
-                # Return a minimal structure if parsing fails
-                return self._get_fallback_structure()
+            print(f"Document analysis returned invalid JSON: {error}")
                 
         except Exception as e:
             print(f"Document analysis failed: {e}")
-            return self._get_fallback_structure()
+        
+        # Use the last parsed response, or a minimal structure if none parsed
+        if last_parsed is not None:
+            return last_parsed
+        return self._get_fallback_structure()
+    
+    @staticmethod
+    def _image_bytes(img_data: Any) -> bytes:
+        """Return the raw bytes of a chart image entry for hashing."""
+        if isinstance(img_data, dict):
+            if img_data.get("bytes"):
+                return img_data["bytes"]
+            img_data = img_data.get("image")
+        if isinstance(img_data, bytes):
+            return img_data
+        return img_data.tobytes() if img_data is not None else b""
     
     def _build_analysis_prompt(self, raw_text: str, tables_data: List[Dict[str, Any]]) -> str:
         """Build the prompt for document analysis."""
         
         # Format tables for the prompt
-        tables_text = ""
-        for i, table in enumerate(tables_data[:15]):
-            tables_text += f"\n\nTABLE {i+1} (Page {table.get('page', '?')}):\n"
+        parts = []
+        for i, table in enumerate(tables_data[:MAX_PROMPT_TABLES]):
+            parts.append(f"\n\nTABLE {i+1} (Page {table.get('page', '?')}):\n")
             headers = table.get('headers', [])
-            rows = table.get('rows', [])[:10]
+            rows = table.get('rows', [])[:MAX_PROMPT_ROWS]
             if headers:
-                tables_text += f"Headers: {' | '.join(str(h) for h in headers)}\n"
+                parts.append(f"Headers: {' | '.join(map(str, headers))}\n")
             for row in rows:
-                tables_text += f"{' | '.join(str(cell) for cell in row)}\n"
+                parts.append(' | '.join(map(str, row)) + "\n")
+        tables_text = "".join(parts)
         
         prompt = f"""Analyze this fund annual report document and extract ALL content into a structured JSON format.
 
 DOCUMENT TEXT:
-{raw_text[:15000]}
+{_compress_raw_text(raw_text, MAX_RAW_TEXT_TOKENS)}
 
 TABLES FOUND:
 {tables_text}
@@ -159,52 +420,56 @@ IMPORTANT:
 """
         return prompt
     
-    def _extract_json(self, text: str) -> Optional[Dict[str, Any]]:
-        """Extract JSON from response text."""
+    def _extract_json(self, text: str) -> Optional[Any]:
+        """Extract a JSON object or array from response text."""
+        # Drop a surrounding markdown code fence, if any
+        text = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+        
         # Try to parse directly
         try:
-            return json.loads(text)
-        except:
+            return _json_loads(text)
+        except ValueError:
             pass
         
-        # Try to find JSON in markdown code block
-        import re
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', text)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except:
-                pass
-        
-        # Try to find JSON object pattern
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
+        # Try each top-level balanced value in the surrounding prose, so an
+        # aside like "[see p.3]" before the real JSON is skipped. A span that
+        # fails to parse is skipped whole; its inner fragments are never tried.
+        span = _find_json_span(text)
+        while span:
             try:
-                return json.loads(json_match.group(0))
-            except:
-                pass
+                return _json_loads(text[span[0]:span[1]])
+            except ValueError:
+                span = _find_json_span(text, span[1])
         
         return None
     
     def _get_fallback_structure(self) -> Dict[str, Any]:
-        """Return minimal fallback structure if analysis fails."""
-        return {
-            "fund_info": {
-                "name": None,
-                "benchmark": None,
-                "currency": None,
-                "report_period": None,
-                "report_type": None
-            },
-            "sections": [],
-            "tables": [],
-            "charts": [],
-            "companies": [],
-            "metrics": [],
-            "time_periods": [],
-            "themes": [],
-            "key_insights": ["Document analysis could not extract structured data. Using raw text for generation."]
-        }
+        """
+        Return minimal fallback structure if analysis fails.
+        
+        The result is a fresh copy of _FALLBACK_STRUCTURE, so callers may mutate it.
+        """
+        return copy.deepcopy(_FALLBACK_STRUCTURE)
+    
+    def _build_charts_prompt(self, count: int, fund_context: str = "") -> str:
+        """Build one prompt asking for a JSON array describing `count` chart images."""
+        slots = ", ".join(f"chart_{n + 1}" for n in range(count))
+        return f"""Analyze these {count} charts from a fund report. {fund_context}
+
+The images are attached in order: {slots}.
+Return a JSON array with exactly {count} objects, one per image in the same order (no markdown):
+[
+    {{
+        "id": "chart_1",
+        "title": "descriptive title",
+        "type": "performance|allocation|comparison|trend|other",
+        "description": "detailed description of what the chart shows",
+        "data_points": ["list of key values/percentages visible"],
+        "include_by_default": true
+    }}
+]
+
+Extract ALL visible data points, percentages, and labels for every chart."""
     
     def analyze_charts_with_vision(
         self, 
@@ -213,58 +478,92 @@ IMPORTANT:
     ) -> List[Dict[str, Any]]:
         """
         Analyze chart images using vision and return structured descriptions.
+        
+        Synchronous wrapper around analyze_charts_with_vision_async. Runs on
+        the shared background loop, which the SDK's async client stays bound to.
         """
-        analyzed_charts = []
+        if not any(img_data.get("image") is not None for img_data in chart_images or []):
+            return []
+        return run_async(self.analyze_charts_with_vision_async(chart_images, fund_context))
+    
+    async def analyze_charts_with_vision_async(
+        self, 
+        chart_images: List[Dict[str, Any]],
+        fund_context: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze chart images using vision and return structured descriptions.
         
-        for i, img_data in enumerate(chart_images[:8]):
-            image = img_data.get("image")
-            page = img_data.get("page", i + 1)
-            
-            if image is None:
-                continue
-            
-            prompt = f"""Analyze this chart from a fund report. {fund_context}
-
-Return JSON with this structure (no markdown):
-{{
-    "id": "chart_{i+1}",
-    "title": "descriptive title",
-    "type": "performance|allocation|comparison|trend|other",
-    "description": "detailed description of what the chart shows",
-    "data_points": ["list of key values/percentages visible"],
-    "include_by_default": true
-}}
-
-Extract ALL visible data points, percentages, and labels."""
-
+        All charts not already cached are sent to the model in a single
+        request, and the returned array is matched back to the images by index.
+        """
+        if not any(img_data.get("image") is not None for img_data in chart_images or []):
+            return []
+        
+        charts = [
+            (i, img_data, img_data.get("page", i + 1))
+            for i, img_data in enumerate(chart_images[:8])
+            if img_data.get("image") is not None
+        ]
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        keys: Dict[int, str] = {}
+        pending = []
+        for i, img_data, page in charts:
+            if self.cache:
+                keys[i] = self._cache_key(
+                    "chart", fund_context.encode(), self._image_bytes(img_data)
+                )
+                cached = self.cache.get(keys[i])
+                if isinstance(cached, dict):
+                    results[i] = {**cached, "id": f"chart_{i+1}"}
+                    continue
+            pending.append((i, img_data, page))
+        
+        if pending:
+            prompt = self._build_charts_prompt(len(pending), fund_context)
             try:
-                # Use vision model for chart analysis
-                response = self.model.generate_content([prompt, image])
-                chart_json = self._extract_json(response.text)
-                
-                if chart_json:
-                    chart_json["page"] = page
-                    chart_json["image"] = image  # Keep reference for UI
-                    analyzed_charts.append(chart_json)
-                else:
-                    analyzed_charts.append({
+                # Use vision model for chart analysis, one request for all charts
+                response = await self.model.generate_content_async(
+                    [prompt, *(img_data["image"] for _, img_data, _ in pending)]
+                )
+                text = response.text
+            except Exception as e:
+                text = None
+                for i, img_data, page in pending:
+                    results[i] = {
                         "id": f"chart_{i+1}",
                         "title": f"Chart on page {page}",
-                        "type": "other",
-                        "description": response.text[:500] if response.text else "Chart detected",
-                        "page": page,
-                        "image": image,
-                        "include_by_default": True
-                    })
-            except Exception as e:
-                analyzed_charts.append({
-                    "id": f"chart_{i+1}",
-                    "title": f"Chart on page {page}",
-                    "type": "other", 
-                    "description": f"Vision analysis failed: {str(e)}",
-                    "page": page,
-                    "image": image,
-                    "include_by_default": False
-                })
+                        "type": "other", 
+                        "description": f"Vision analysis failed: {str(e)}",
+                        "include_by_default": False
+                    }
+            
+            if text is not None:
+                charts_json = self._extract_json(text)
+                if isinstance(charts_json, dict):
+                    charts_json = [charts_json]
+                elif not isinstance(charts_json, list):
+                    charts_json = []
+                
+                for slot, (i, img_data, page) in enumerate(pending):
+                    chart_json = charts_json[slot] if slot < len(charts_json) else None
+                    if isinstance(chart_json, dict):
+                        chart_json["id"] = f"chart_{i+1}"
+                        if i in keys:
+                            self.cache.put(keys[i], chart_json, self.model_name)
+                        results[i] = chart_json
+                    else:
+                        results[i] = {
+                            "id": f"chart_{i+1}",
+                            "title": f"Chart on page {page}",
+                            "type": "other",
+                            "description": text[:500] if text else "Chart detected",
+                            "include_by_default": True
+                        }
         
-        return analyzed_charts
+        # Keep page and image references for the UI
+        return [
+            {**results[i], "page": page, "image": img_data["image"]}
+            for i, img_data, page in charts
+        ]
@@ -0,0 +1,60 @@
+"""
+A single background event loop for running async LLM calls.
+
+The Gemini SDK and the shared httpx.AsyncClient bind to the loop that first
+uses them, so starting a fresh loop per call (asyncio.run) breaks every call
+after the first. Sync code uses run_async; async methods hop onto the loop
+with on_shared_loop or iterate_on_shared_loop.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Coroutine, Optional
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared loop on a daemon thread the first time it is needed."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="gemini-async", daemon=True).start()
+    return _LOOP
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine on the shared loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+async def on_shared_loop(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Await a coroutine on the shared loop, whichever loop the caller runs on."""
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def iterate_on_shared_loop(agen: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Drive an async generator on the shared loop, yielding its items to the caller's loop."""
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        async for item in agen:
+            yield item
+        return
+    
+    done = object()
+    
+    async def _next() -> Any:
+        try:
+            return await agen.__anext__()
+        except StopAsyncIteration:
+            return done
+    
+    while True:
+        item = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_next(), loop))
+        if item is done:
+            return
+        yield item
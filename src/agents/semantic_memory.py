@@ -0,0 +1,88 @@
+"""
+Conversation memory that keeps recent turns plus the turns most relevant to the current query.
+"""
+from typing import Any, Dict, List, Optional
+import math
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import BaseMessage, get_buffer_string
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    """Cosine similarity between two vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticWindowMemory(BaseChatMemory):
+    """
+    Chat memory that sends only a subset of past turns to the LLM.
+
+    Every completed turn is embedded on save. When loading, the last
+    `last_n` turns are always included, plus the `top_k` older turns whose
+    embeddings are most similar to the incoming query. The full transcript
+    stays in `chat_memory` for display.
+    """
+
+    embeddings: Any
+    memory_key: str = "chat_history"
+    last_n: int = 2
+    top_k: int = 4
+    turn_embeddings: List[Optional[List[float]]] = []
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _input_text(self, inputs: Dict[str, Any]) -> str:
+        """Get the user input from a chain's inputs."""
+        key = self.input_key or ("input" if "input" in inputs else None)
+        if key is None:
+            key = next((k for k in inputs if k != self.memory_key), None)
+        return str(inputs.get(key, "")) if key else ""
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text, returning None if the embedding call fails."""
+        try:
+            return self.embeddings.embed_query(text)
+        except Exception:
+            return None
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """Save the turn and its embedding."""
+        super().save_context(inputs, outputs)
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        self.turn_embeddings.append(self._embed(f"{input_str}\n{output_str}"))
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the recent turns plus the most relevant older turns."""
+        messages = self.chat_memory.messages
+        n_turns = min(len(self.turn_embeddings), len(messages) // 2)
+
+        recent_start = max(0, n_turns - self.last_n)
+        selected = set(range(recent_start, n_turns))
+
+        older = [i for i in range(recent_start) if self.turn_embeddings[i] is not None]
+        if older and self.top_k > 0:
+            query_embedding = self._embed(self._input_text(inputs))
+            if query_embedding is not None:
+                ranked = sorted(
+                    older,
+                    key=lambda i: _cosine(query_embedding, self.turn_embeddings[i]),
+                    reverse=True
+                )
+                selected.update(ranked[:self.top_k])
+
+        history: List[BaseMessage] = []
+        for i in sorted(selected):
+            history.extend(messages[2 * i:2 * i + 2])
+
+        if self.return_messages:
+            return {self.memory_key: history}
+        return {self.memory_key: get_buffer_string(history)}
+
+    def clear(self) -> None:
+        """Clear memory contents."""
+        super().clear()
+        self.turn_embeddings = []
@@ -0,0 +1,33 @@
+"""
+Token counting helpers shared by the agents.
+"""
+import functools
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, or estimate at ~4 characters per token."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Return the longest prefix of text that is at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
@@ -2,10 +2,114 @@
 Calculation tools for financial computations.
 """
 from typing import Optional, List, Type
+import re
+
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
 
+# Patterns used by ExtractNumbersTool, compiled once at import. They scan UTF-8
+# bytes; non-ASCII spaces (NBSP, narrow NBSP) and currency sigils are spelled
+# out as byte sequences since bytes patterns only know ASCII classes.
+_SPACE_B = rb'(?:\s|\xc2\xa0|\xe2\x80\xaf)*'
+_SIGIL_B = rb'(?:\$|\xe2\x82\xac|\xc2\xa3|\xc2\xa5)?'
+PCT_BRE = re.compile(rb'([\-\+]?\d+\.?\d*)' + _SPACE_B + rb'%')
+CCY_BRE = re.compile(
+    _SIGIL_B + _SPACE_B + rb'([\d,]+\.?\d*)' + _SPACE_B + rb'(million|billion|M|B|mn|bn)?'
+)
+
+
+_OUTPERFORMANCE_TEMPLATE = """Outperformance Calculation:
+Fund Return: {fund_return:+.2f}%
+Benchmark Return: {benchmark_return:+.2f}%
+Outperformance: {outperformance:+.2f}%
+{verdict}"""
+
+_WEIGHT_CHANGE_TEMPLATE = """Weight Change for {label}:
+Previous Weight: {old_weight:.2f}%
+Current Weight: {new_weight:.2f}%
+Absolute Change: {change:+.2f}%
+Relative Change: {pct_change:+.1f}%"""
+
+_CUSTOM_TEMPLATE = """Custom Calculation:
+Values: {values}
+Sum: {total:.2f}
+Average: {avg:.2f}
+Min: {min_val:.2f}
+Max: {max_val:.2f}
+Count: {count}"""
+
+
+def _calc_outperformance(values: List[float], labels: Optional[List[str]]) -> str:
+    """Fund return minus benchmark return."""
+    if len(values) < 2:
+        return "Need at least 2 values: fund_return and benchmark_return"
+    
+    fund_return, benchmark_return = values[0], values[1]
+    outperformance = fund_return - benchmark_return
+    return _OUTPERFORMANCE_TEMPLATE.format_map({
+        "fund_return": fund_return,
+        "benchmark_return": benchmark_return,
+        "outperformance": outperformance,
+        "verdict": "(Fund outperformed)" if outperformance > 0 else "(Fund underperformed)",
+    })
+
+
+def _calc_attribution(values: List[float], labels: Optional[List[str]]) -> str:
+    """Each value's share of the total contribution."""
+    if not labels or len(labels) != len(values):
+        labels = [f"Item {i+1}" for i in range(len(values))]
+    
+    total = sum(values)
+    scale = 100 / total if total != 0 else 0
+    result_lines = ["Attribution Analysis:"]
+    
+    for label, value in zip(labels, values):
+        pct = value * scale
+        result_lines.append(f"  {label}: {value:+.2f}% ({pct:.1f}% of total)")
+    
+    result_lines.append(f"\nTotal: {total:+.2f}%")
+    return "\n".join(result_lines)
+
+
+def _calc_weight_change(values: List[float], labels: Optional[List[str]]) -> str:
+    """Absolute and relative change between an old and a new weight."""
+    if len(values) < 2:
+        return "Need at least 2 values: old_weight and new_weight"
+    
+    old_weight, new_weight = values[0], values[1]
+    change = new_weight - old_weight
+    return _WEIGHT_CHANGE_TEMPLATE.format_map({
+        "label": labels[0] if labels else "Position",
+        "old_weight": old_weight,
+        "new_weight": new_weight,
+        "change": change,
+        "pct_change": (change / old_weight * 100) if old_weight != 0 else 0,
+    })
+
+
+def _calc_custom(values: List[float], labels: Optional[List[str]]) -> str:
+    """Basic statistics over the values."""
+    count = len(values)
+    total = sum(values)
+    return _CUSTOM_TEMPLATE.format_map({
+        "values": ', '.join(f'{v:.2f}' for v in values),
+        "total": total,
+        "avg": total / count if count else 0,
+        "min_val": min(values, default=0),
+        "max_val": max(values, default=0),
+        "count": count,
+    })
+
+
+_CALC_FNS = {
+    "outperformance": _calc_outperformance,
+    "attribution": _calc_attribution,
+    "weight_change": _calc_weight_change,
+    "custom": _calc_custom,
+}
+
+
 class CalculationInput(BaseModel):
     """Input for calculation tool."""
     calculation_type: str = Field(
@@ -36,70 +140,11 @@ class FinancialCalculationTool(BaseTool):
         labels: Optional[List[str]] = None
     ) -> str:
         """Perform calculation."""
+        calculate = _CALC_FNS.get(calculation_type)
+        if calculate is None:
+            return f"Unknown calculation type: {calculation_type}"
         try:
-            if calculation_type == "outperformance":
-                if len(values) < 2:
-                    return "Need at least 2 values: fund_return and benchmark_return"
-                
-                fund_return = values[0]
-                benchmark_return = values[1]
-                outperformance = fund_return - benchmark_return
-                
-                return f"""Outperformance Calculation:
-Fund Return: {fund_return:+.2f}%
-Benchmark Return: {benchmark_return:+.2f}%
-Outperformance: {outperformance:+.2f}%
-{"(Fund outperformed)" if outperformance > 0 else "(Fund underperformed)"}"""
-            
-            elif calculation_type == "attribution":
-                if not labels or len(labels) != len(values):
-                    labels = [f"Item {i+1}" for i in range(len(values))]
-                
-                total = sum(values)
-                result_lines = ["Attribution Analysis:"]
-                
-                for label, value in zip(labels, values):
-                    pct = (value / total * 100) if total != 0 else 0
-                    result_lines.append(f"  {label}: {value:+.2f}% ({pct:.1f}% of total)")
-                
-                result_lines.append(f"\nTotal: {total:+.2f}%")
-                return "\n".join(result_lines)
-            
-            elif calculation_type == "weight_change":
-                if len(values) < 2:
-                    return "Need at least 2 values: old_weight and new_weight"
-                
-                old_weight = values[0]
-                new_weight = values[1]
-                change = new_weight - old_weight
-                pct_change = ((new_weight - old_weight) / old_weight * 100) if old_weight != 0 else 0
-                
-                label = labels[0] if labels else "Position"
-                
-                return f"""Weight Change for {label}:
-Previous Weight: {old_weight:.2f}%
-Current Weight: {new_weight:.2f}%
-Absolute Change: {change:+.2f}%
-Relative Change: {pct_change:+.1f}%"""
-            
-            elif calculation_type == "custom":
-                # Basic statistics
-                total = sum(values)
-                avg = total / len(values) if values else 0
-                min_val = min(values) if values else 0
-                max_val = max(values) if values else 0
-                
-                return f"""Custom Calculation:
-Values: {', '.join(f'{v:.2f}' for v in values)}
-Sum: {total:.2f}
-Average: {avg:.2f}
-Min: {min_val:.2f}
-Max: {max_val:.2f}
-Count: {len(values)}"""
-            
-            else:
-                return f"Unknown calculation type: {calculation_type}"
-                
+            return calculate(values, labels)
         except Exception as e:
             return f"Calculation error: {str(e)}"
     
@@ -133,32 +178,32 @@ class ExtractNumbersTool(BaseTool):
     
     def _run(self, text: str, number_type: str = "percentage") -> str:
         """Extract numbers from text."""
-        import re
-        
         numbers = []
+        text_b = text.encode("utf-8")
         
-        if number_type in ["percentage", "all"]:
+        # Every percentage contains a literal '%', so skip the regex scan without one
+        if number_type in ["percentage", "all"] and b"%" in text_b:
             # Find percentages
-            pct_pattern = r'([\-\+]?\d+\.?\d*)\s*%'
-            matches = re.findall(pct_pattern, text)
+            matches = PCT_BRE.findall(text_b)
             for match in matches:
                 try:
                     numbers.append({
                         "value": float(match),
                         "type": "percentage",
-                        "original": f"{match}%"
+                        "original": f"{match.decode('ascii')}%"
                     })
                 except:
                     pass
         
         if number_type in ["currency", "all"]:
             # Find currency values
-            currency_pattern = r'[\$\€\£\¥]?\s*([\d,]+\.?\d*)\s*(million|billion|M|B|mn|bn)?'
-            matches = re.findall(currency_pattern, text)
-            for match in matches:
+            matches = CCY_BRE.findall(text_b)
+            for amount_b, multiplier_b in matches:
                 try:
-                    value = float(match[0].replace(",", ""))
-                    multiplier = match[1].lower() if match[1] else ""
+                    amount = amount_b.decode("ascii")
+                    multiplier_text = multiplier_b.decode("ascii")
+                    value = float(amount_b.replace(b",", b""))
+                    multiplier = multiplier_text.lower()
                     if multiplier in ["million", "m", "mn"]:
                         value *= 1_000_000
                     elif multiplier in ["billion", "b", "bn"]:
@@ -167,7 +212,7 @@ class ExtractNumbersTool(BaseTool):
                     numbers.append({
                         "value": value,
                         "type": "currency",
-                        "original": f"{match[0]} {match[1]}".strip()
+                        "original": f"{amount} {multiplier_text}".strip()
                     })
                 except:
                     pass
@@ -1,11 +1,45 @@
 """
 Search tools for document retrieval.
 """
-from typing import Optional, Type
+from typing import Optional, Type, Dict, Tuple, List, Any
+from collections import OrderedDict
+from itertools import islice
+import time
+
+import numpy as np
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
 
+# Results per search call and how long a query's ranked results are reused across pages
+PAGE_SIZE = 10
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_SIZE = 128
+
+# Deepest offset the agent may page to for a single query
+MAX_SKIP = 50
+
+# Queries whose embeddings are at least this similar share cached results
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_SIZE = 256
+
+
+def _matches_section(chunk: Dict[str, Any], section_lower: str) -> bool:
+    """Check a chunk's section name and opening text against a lowercased section."""
+    metadata = chunk.get("metadata") or {}
+    section_lc = metadata.get("section_name_lc")
+    if section_lc is None:
+        section_lc = str(metadata.get("section_name", "")).lower()
+    if section_lower in section_lc:
+        return True
+    
+    # Chunks stored before the lowercased fields were added compute them on the fly
+    head_lc = metadata.get("content_head_lc")
+    if head_lc is None:
+        head_lc = chunk.get("content", "")[:200].lower()
+    return section_lower in head_lc
+
+
 class SearchInput(BaseModel):
     """Input for search tool."""
     query: str = Field(description="The search query to find relevant document sections")
@@ -23,28 +57,97 @@ class DocumentSearchTool(BaseTool):
     Returns up to 5 text chunks per call. Use 'skip' parameter for pagination.
     
     IMPORTANT: If you receive exactly 10 results, there may be more relevant data.
-    Call again with skip=10, then skip=20, etc. until you get fewer than 10 results."""
+    Call again with skip=10, then skip=20, etc. until you get fewer than 10 results
+    (at most skip=40)."""
     args_schema: Type[BaseModel] = SearchInput
     
     vector_store: any = None
+    # query -> (fetched_at, ranked results fetched so far, whether the store ran out)
+    page_cache: Dict[str, Tuple[float, List[Dict[str, Any]], bool]] = Field(default_factory=dict)
+    # query -> unit-length embedding, most recently used last
+    query_embeddings: OrderedDict = Field(default_factory=OrderedDict)
+    store_version: int = 0
     
     def __init__(self, vector_store):
         super().__init__()
         self.vector_store = vector_store
+        self.store_version = getattr(vector_store, "version", 0)
+    
+    def _cached_query(self, query: str) -> str:
+        """
+        Map query to a previously searched, near-identical query if there is one.
+        
+        Embeddings come from the vector store's cached embed_query, so a miss
+        costs no extra API call: the search that follows reuses the embedding.
+        """
+        if query in self.page_cache or not hasattr(self.vector_store, "embed_query"):
+            return query
+        try:
+            embedding = np.asarray(self.vector_store.embed_query(query), dtype=np.float32)
+        except Exception:
+            return query
+        norm = np.linalg.norm(embedding)
+        if not norm:
+            return query
+        embedding /= norm
+        
+        if self.query_embeddings:
+            queries = list(self.query_embeddings)
+            scores = np.stack(list(self.query_embeddings.values())) @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_CACHE_THRESHOLD and queries[best] in self.page_cache:
+                self.query_embeddings.move_to_end(queries[best])
+                return queries[best]
+        
+        self.query_embeddings[query] = embedding
+        if len(self.query_embeddings) > SEMANTIC_CACHE_SIZE:
+            self.query_embeddings.popitem(last=False)
+        return query
+    
+    def _get_page(self, query: str, skip: int) -> List[Dict[str, Any]]:
+        """Return results [skip, skip + PAGE_SIZE), reusing pages already fetched for this query."""
+        # Documents were added or removed since results were cached
+        version = getattr(self.vector_store, "version", 0)
+        if version != self.store_version:
+            self.page_cache.clear()
+            self.query_embeddings.clear()
+            self.store_version = version
+        
+        query = self._cached_query(query)
+        now = time.monotonic()
+        fetched_at, ranked, exhausted = self.page_cache.get(query, (now, [], False))
+        if now - fetched_at > SEARCH_CACHE_TTL:
+            fetched_at, ranked, exhausted = now, [], False
+        
+        end = skip + PAGE_SIZE
+        if len(ranked) < end and not exhausted:
+            # IMPORTANT: Don't filter by doc_id by default - this excludes secondary sources!
+            # Secondary sources have their own source_id but share parent_doc_id
+            # Search ALL content to include attached URLs, files, etc.
+            wanted = end - len(ranked)
+            more = self.vector_store.search(
+                query=query,
+                n_results=wanted,
+                offset=len(ranked),
+                filter_doc_id=None  # Always search all content, including secondary sources
+            ) or []
+            ranked = ranked + more
+            exhausted = len(more) < wanted
+            
+            self.page_cache.pop(query, None)
+            if len(self.page_cache) >= SEARCH_CACHE_SIZE:
+                # Drop the least recently fetched query
+                self.page_cache.pop(next(iter(self.page_cache)))
+            self.page_cache[query] = (fetched_at, ranked, exhausted)
+        
+        return ranked[skip:end]
     
     def _run(self, query: str, doc_id: Optional[str] = None, skip: int = 0) -> str:
         """Execute the search."""
-        # IMPORTANT: Don't filter by doc_id by default - this excludes secondary sources!
-        # Secondary sources have their own source_id but share parent_doc_id
-        # Search ALL content to include attached URLs, files, etc.
-        results = self.vector_store.search(
-            query=query,
-            n_results=10 + skip,
-            filter_doc_id=None  # Always search all content, including secondary sources
-        )
-        
-        # Apply skip (pagination)
-        results = results[skip:skip + 10] if results else []
+        if skip >= MAX_SKIP:
+            return f"✅ [COMPLETE: pagination limit reached (skip={skip}). Answer with the results you already have.]"
+        
+        results = self._get_page(query, skip)
         
         if not results:
             return f"No more results found (skip={skip}). You have retrieved all relevant information."
@@ -64,9 +167,10 @@ class DocumentSearchTool(BaseTool):
         result_text = "\n\n---\n\n".join(formatted)
         result_count = len(results)
         
-        if result_count == 10:
-            result_text += f"\n\n---\n📊 [INFO: Received {result_count} results. More may exist (skip={skip + 10}).]"
-            result_text += f"\n💡 [DECISION: If these results SUFFICIENTLY answer the user's question, respond now. Otherwise, call search_documents with skip={skip + 10} for more results.]"
+        remaining_pages = (MAX_SKIP - skip - PAGE_SIZE) // PAGE_SIZE
+        if result_count == PAGE_SIZE and remaining_pages > 0:
+            result_text += f"\n\n---\n📊 [INFO: Received {result_count} results. More may exist (skip={skip + PAGE_SIZE}, remaining pages: {remaining_pages}).]"
+            result_text += f"\n💡 [DECISION: If these results SUFFICIENTLY answer the user's question, respond now. Otherwise, call search_documents with skip={skip + PAGE_SIZE} for more results.]"
         else:
             result_text += f"\n\n---\n✅ [COMPLETE: {result_count} results. No more data available.]"
         
@@ -113,14 +217,10 @@ class DocumentRetrieverTool(BaseTool):
         if not chunks:
             return f"No content found for document '{doc_id}'."
         
-        # Filter by section if specified
+        # Filter by section if specified, stopping once enough chunks match
         if section:
             section_lower = section.lower()
-            chunks = [
-                c for c in chunks 
-                if section_lower in str(c.get("metadata", {}).get("section_name", "")).lower()
-                or section_lower in c.get("content", "").lower()[:200]
-            ]
+            chunks = (c for c in chunks if _matches_section(c, section_lower))
         
         # Format output
         header = f"Document: {doc_info.get('filename', doc_id)}\n"
@@ -128,7 +228,7 @@ class DocumentRetrieverTool(BaseTool):
         header += f"Period: {doc_info.get('report_period', 'Unknown')}\n"
         header += "---\n\n"
         
-        content = "\n\n".join(c["content"] for c in chunks[:10])  # Limit chunks
+        content = "\n\n".join(c["content"] for c in islice(chunks, 10))  # Limit chunks
         
         return header + content
     
@@ -3,13 +3,161 @@ Stock data tools for fetching real-time market data.
 Focused on Swedish/Nordic markets (OMX Stockholm) with SEK currency.
 """
 from typing import Optional, List
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+import re
+import time
+
 from langchain.tools import tool
 
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+try:
+    import yfinance_cache as yfc  # drop-in for yfinance that keeps responses on disk
+except ImportError:
+    yfc = None
+
+# Errors a Yahoo lookup can fail with. Network errors from requests and
+# curl_cffi are OSError subclasses; malformed responses surface as the rest.
+_FETCH_ERRORS = (OSError, KeyError, IndexError, ValueError, TypeError)
+try:
+    from yfinance.exceptions import YFException
+    _FETCH_ERRORS += (YFException,)
+except ImportError:
+    pass
+
+
+# How long cached Yahoo data is reused when yfinance-cache is installed
+FX_MAX_AGE = timedelta(hours=1)
+PRICE_MAX_AGE = timedelta(minutes=15)
+
+# Display prefix per currency; unknown currencies show their code
+CURRENCY_SYMBOLS = MappingProxyType({
+    "SEK": "kr ",
+    "NOK": "kr ",
+    "DKK": "kr ",
+    "EUR": "€",
+    "USD": "$",
+    "JPY": "¥",
+    "GBP": "£",
+    "CHF": "CHF ",
+    "CNY": "¥",
+    "HKD": "HK$",
+    "KRW": "₩",
+})
+
+# Date formats accepted by get_historical_stock_data. The input's shape picks
+# the format, so only one strptime call is made per date.
+DATE_PATTERNS = (
+    (re.compile(r"^\d{4}-\d{1,2}-\d{1,2}$"), "%Y-%m-%d"),  # 2024-12-15
+    (re.compile(r"^\d{4}-\d{1,2}$"), "%Y-%m"),              # 2024-12
+    (re.compile(r"^[A-Za-z]{4,} \d{4}$"), "%B %Y"),         # December 2024
+    (re.compile(r"^[A-Za-z]{3} \d{4}$"), "%b %Y"),          # Dec 2024
+    (re.compile(r"^\d{4}/\d{1,2}/\d{1,2}$"), "%Y/%m/%d"),  # 2024/12/15
+    (re.compile(r"^\d{1,2}-\d{1,2}-\d{4}$"), "%d-%m-%Y"),  # 15-12-2024
+)
+
+# Concurrent Yahoo requests for batch lookups, and the most tickers per batch
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+MAX_BATCH_TICKERS = 10
+
+# How long an exchange rate is reused in-process
+FX_CACHE_SECONDS = 300
+
+# How long a ticker's prices are reused in-process, and how long its profile
+# (name, sector, ratios, description) is kept before the full info is refetched
+QUOTE_CACHE_SECONDS = 60
+PROFILE_CACHE_SECONDS = 3600
+
+# fast_info field (snake_case, see _fast_info_value) for each price field
+# get_stock_info returns. Once the profile is cached, only these are refreshed,
+# which skips Yahoo's slower quoteSummary endpoint behind Ticker.info.
+FAST_QUOTE_FIELDS = MappingProxyType({
+    "price": "last_price",
+    "market_cap": "market_cap",
+    "52_week_high": "year_high",
+    "52_week_low": "year_low",
+    "50_day_avg": "fifty_day_average",
+    "200_day_avg": "two_hundred_day_average",
+    "volume": "last_volume",
+    "avg_volume": "three_month_average_volume",
+})
+
+# Trading currency implied by a Yahoo exchange suffix, used to start the FX
+# lookup before the quote arrives. Tickers without a suffix are US listings.
+SUFFIX_CURRENCIES = MappingProxyType({
+    "ST": "SEK",
+    "CO": "DKK",
+    "OL": "NOK",
+    "HE": "EUR",
+    "PA": "EUR",
+    "AS": "EUR",
+    "DE": "EUR",
+    "SW": "CHF",
+    "T": "JPY",
+    "HK": "HKD",
+    "KS": "KRW",
+})
+
+# Fallback approximate rates (as of 2024 - should be updated periodically)
+FALLBACK_RATES = MappingProxyType({
+    "USD": 10.5,
+    "EUR": 11.3,
+    "GBP": 13.2,
+    "JPY": 0.070,  # 1 JPY ≈ 0.07 SEK
+    "NOK": 0.98,
+    "DKK": 1.52,
+    "CHF": 11.8,
+    "CAD": 7.7,
+    "AUD": 6.8,
+    "CNY": 1.45,
+    "HKD": 1.35,
+    "KRW": 0.0078,
+})
+
+
+def _get_ticker(symbol: str):
+    """Return a Ticker from yfinance-cache if installed, else from yfinance."""
+    if yfc is not None:
+        return yfc.Ticker(symbol)
+    if yf is None:
+        raise ImportError("yfinance is not installed")
+    return yf.Ticker(symbol)
+
+
+def _fast_info_value(fast_info, name: str):
+    """
+    Read a fast_info field by its snake_case name, or None if it is missing.
+    
+    yfinance exposes fast_info as an object with snake_case attributes, while
+    yfinance-cache returns a plain dict with camelCase keys ("lastPrice").
+    """
+    if isinstance(fast_info, dict):
+        first, *rest = name.split("_")
+        return fast_info.get(first + "".join(word.title() for word in rest))
+    return getattr(fast_info, name, None)
+
+
+def _history(ticker, max_age: Optional[timedelta] = None, **kwargs):
+    """Call ticker.history, passing max_age only when yfinance-cache is in use."""
+    if yfc is not None and max_age is not None:
+        kwargs["max_age"] = max_age
+    return ticker.history(**kwargs)
+
 
 def get_exchange_rate_to_sek(from_currency: str) -> Optional[float]:
     """
     Get exchange rate from a currency to SEK.
     
+    Rates are cached per currency for up to FX_CACHE_SECONDS, so several
+    foreign stocks in one session share a single lookup.
+    
     Args:
         from_currency: Source currency code (e.g., "USD", "JPY", "EUR")
     
@@ -18,16 +166,27 @@ def get_exchange_rate_to_sek(from_currency: str) -> Optional[float]:
     """
     if from_currency == "SEK":
         return 1.0
+    return _cached_rate(from_currency, int(time.time() // FX_CACHE_SECONDS))
+
+
+@lru_cache(maxsize=64)
+def _cached_rate(from_currency: str, time_bucket: int) -> Optional[float]:
+    """Memoize _fetch_rate per currency and time bucket."""
+    return _fetch_rate(from_currency)
+
+
+def _fetch_rate(from_currency: str) -> Optional[float]:
+    """Look up the current rate on Yahoo Finance, falling back to FALLBACK_RATES."""
+    if yf is None and yfc is None:
+        return FALLBACK_RATES.get(from_currency)
     
     try:
-        import yfinance as yf
-        
         # yfinance format for currency pairs: XXXSEK=X
         pair = f"{from_currency}SEK=X"
-        ticker = yf.Ticker(pair)
+        ticker = _get_ticker(pair)
         
         # Try to get current price
-        hist = ticker.history(period="1d")
+        hist = _history(ticker, FX_MAX_AGE, period="1d")
         if not hist.empty:
             return hist['Close'].iloc[-1]
         
@@ -37,25 +196,37 @@ def get_exchange_rate_to_sek(from_currency: str) -> Optional[float]:
         if rate:
             return rate
             
-    except Exception:
+    except _FETCH_ERRORS:
         pass
     
-    # Fallback approximate rates (as of 2024 - should be updated periodically)
-    fallback_rates = {
-        "USD": 10.5,
-        "EUR": 11.3,
-        "GBP": 13.2,
-        "JPY": 0.070,  # 1 JPY ≈ 0.07 SEK
-        "NOK": 0.98,
-        "DKK": 1.52,
-        "CHF": 11.8,
-        "CAD": 7.7,
-        "AUD": 6.8,
-        "CNY": 1.45,
-        "HKD": 1.35,
-        "KRW": 0.0078,
-    }
-    return fallback_rates.get(from_currency)
+    return FALLBACK_RATES.get(from_currency)
+
+
+def guess_currency(ticker: str) -> Optional[str]:
+    """Guess a ticker's trading currency from its exchange suffix, or None if unknown."""
+    _, dot, suffix = ticker.rpartition(".")
+    if not dot:
+        return "USD"
+    return SUFFIX_CURRENCIES.get(suffix.upper())
+
+
+@lru_cache(maxsize=512)
+def _cached_info(ticker: str, time_bucket: int) -> tuple:
+    """Fetch a ticker's info dict with its fetch time, memoized per ticker and time bucket."""
+    return time.time(), _get_ticker(ticker).info
+
+
+@lru_cache(maxsize=512)
+def _cached_quote(ticker: str, time_bucket: int) -> dict:
+    """Fetch the FAST_QUOTE_FIELDS from fast_info, memoized per ticker and time bucket."""
+    fast_info = _get_ticker(ticker).fast_info
+    quote = {}
+    for field, name in FAST_QUOTE_FIELDS.items():
+        try:
+            quote[field] = _fast_info_value(fast_info, name)
+        except _FETCH_ERRORS:
+            quote[field] = None
+    return quote
 
 
 def get_stock_info(ticker: str) -> dict:
@@ -68,14 +239,15 @@ def get_stock_info(ticker: str) -> dict:
     Returns:
         Dictionary with stock data
     """
+    if yf is None and yfc is None:
+        return {"error": "yfinance not installed. Run: pip install yfinance"}
+    
     try:
-        import yfinance as yf
-        
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        now = time.time()
+        fetched_at, info = _cached_info(ticker, int(now // PROFILE_CACHE_SECONDS))
         
         # Extract key metrics
-        return {
+        data = {
             "ticker": ticker,
             "name": info.get("longName", info.get("shortName", ticker)),
             "price": info.get("currentPrice", info.get("regularMarketPrice")),
@@ -95,98 +267,120 @@ def get_stock_info(ticker: str) -> dict:
             "exchange": info.get("exchange"),
             "description": info.get("longBusinessSummary", "")[:500]  # Truncate description
         }
-    except ImportError:
-        return {"error": "yfinance not installed. Run: pip install yfinance"}
+        
+        # A profile older than the quote window only supplies the descriptive
+        # fields; prices come from the lighter fast_info lookup. If that
+        # refresh fails, the cached profile's prices are still shown.
+        if now - fetched_at >= QUOTE_CACHE_SECONDS:
+            try:
+                quote = _cached_quote(ticker, int(now // QUOTE_CACHE_SECONDS))
+                data.update((field, value) for field, value in quote.items() if value is not None)
+            except _FETCH_ERRORS:
+                pass
+        
+        return data
     except Exception as e:
         return {"error": str(e)}
 
 
-def format_stock_data(data: dict) -> str:
-    """Format stock data dictionary as readable string with SEK conversion for foreign stocks."""
+# Magnitude suffixes, largest first
+_SCALES = ((1e12, "T"), (1e9, "B"), (1e6, "M"))
+
+
+def format_number(n, prefix="", suffix=""):
+    """Format a number with a T/B/M magnitude suffix, or "N/A" for None."""
+    if n is None:
+        return "N/A"
+    # yfinance returns counts like market cap as int, so scale those too
+    if isinstance(n, (int, float)) and not isinstance(n, bool):
+        n = float(n)
+        for threshold, scale in _SCALES:
+            if n >= threshold:
+                return f"{prefix}{n/threshold:.2f}{scale}{suffix}"
+        return f"{prefix}{n:,.2f}{suffix}"
+    return f"{prefix}{n}{suffix}"
+
+
+# Layout of a get_stock_data reply, filled in by format_stock_data
+_STOCK_TEMPLATE = """\
+**{name}** ({ticker})
+Exchange: {exchange} | Sector: {sector}{fx_line}
+
+**Current Price:** {price}
+**Market Cap:** {market_cap}
+
+**Valuation:**
+  • P/E Ratio (TTM): {pe_ratio}
+  • Forward P/E: {forward_pe}
+  • Dividend Yield: {dividend_yield}
+
+**Price Range (52 Week):**
+  • High: {high_52w}
+  • Low: {low_52w}
+
+**Moving Averages:**
+  • 50-Day: {avg_50d}
+  • 200-Day: {avg_200d}
+
+**Volume:** {volume} (Avg: {avg_volume}){about}"""
+
+
+def format_stock_data(data: dict, exchange_rate: Optional[float] = None) -> str:
+    """
+    Format stock data dictionary as readable string with SEK conversion for foreign stocks.
+    
+    A prefetched exchange_rate for the stock's currency skips the lookup here.
+    """
     if "error" in data:
         return f"Error fetching stock data: {data['error']}"
     
-    def format_number(n, prefix="", suffix=""):
-        if n is None:
-            return "N/A"
-        if isinstance(n, float):
-            if n >= 1_000_000_000_000:
-                return f"{prefix}{n/1_000_000_000_000:.2f}T{suffix}"
-            elif n >= 1_000_000_000:
-                return f"{prefix}{n/1_000_000_000:.2f}B{suffix}"
-            elif n >= 1_000_000:
-                return f"{prefix}{n/1_000_000:.2f}M{suffix}"
-            else:
-                return f"{prefix}{n:,.2f}{suffix}"
-        return f"{prefix}{n}{suffix}"
-    
     currency = data.get("currency", "SEK")
     is_foreign = currency != "SEK"
     
-    # Get exchange rate for foreign currencies
-    exchange_rate = None
-    if is_foreign:
+    # Get exchange rate for foreign currencies unless the caller already has it
+    if is_foreign and exchange_rate is None:
         exchange_rate = get_exchange_rate_to_sek(currency)
     
-    currency_symbol = {
-        "SEK": "kr ", 
-        "NOK": "kr ", 
-        "DKK": "kr ",
-        "EUR": "€",
-        "USD": "$", 
-        "JPY": "¥", 
-        "GBP": "£",
-        "CHF": "CHF ",
-        "CNY": "¥",
-        "HKD": "HK$",
-        "KRW": "₩",
-    }.get(currency, currency + " ")
-    
-    def format_with_sek(value, prefix=""):
-        """Format a value with optional SEK equivalent for foreign stocks."""
+    currency_symbol = CURRENCY_SYMBOLS.get(currency, currency + " ")
+    
+    def format_native(value):
+        """Format a value in the stock's own currency."""
+        if value is None:
+            return "N/A"
+        return format_number(value, prefix=currency_symbol)
+    
+    def format_fx(value):
+        """Format a value with its SEK equivalent for foreign stocks."""
         if value is None:
             return "N/A"
-        native = f"{prefix}{currency_symbol}{format_number(value)}"
-        if is_foreign and exchange_rate:
-            sek_value = value * exchange_rate
-            sek_formatted = format_number(sek_value)
-            return f"{native} (~{sek_formatted} kr SEK)"
-        return native
-    
-    lines = [
-        f"**{data.get('name', data['ticker'])}** ({data['ticker']})",
-        f"Exchange: {data.get('exchange', 'N/A')} | Sector: {data.get('sector', 'N/A')}",
-    ]
-    
-    # Show exchange rate info for foreign stocks
-    if is_foreign and exchange_rate:
-        lines.append(f"*Currency: {currency} (1 {currency} ≈ {exchange_rate:.4f} SEK)*")
-    
-    lines.extend([
-        "",
-        f"**Current Price:** {format_with_sek(data.get('price'))}",
-        f"**Market Cap:** {format_with_sek(data.get('market_cap'))}",
-        "",
-        "**Valuation:**",
-        f"  • P/E Ratio (TTM): {format_number(data.get('pe_ratio'))}",
-        f"  • Forward P/E: {format_number(data.get('forward_pe'))}",
-        f"  • Dividend Yield: {format_number(data.get('dividend_yield'), suffix='%') if data.get('dividend_yield') else 'N/A'}",
-        "",
-        "**Price Range (52 Week):**",
-        f"  • High: {format_with_sek(data.get('52_week_high'))}",
-        f"  • Low: {format_with_sek(data.get('52_week_low'))}",
-        "",
-        "**Moving Averages:**",
-        f"  • 50-Day: {format_with_sek(data.get('50_day_avg'))}",
-        f"  • 200-Day: {format_with_sek(data.get('200_day_avg'))}",
-        "",
-        f"**Volume:** {format_number(data.get('volume'))} (Avg: {format_number(data.get('avg_volume'))})",
-    ])
-    
-    if data.get("description"):
-        lines.extend(["", "**About:**", data["description"][:300] + "..."])
-    
-    return "\n".join(lines)
+        return f"{format_number(value, prefix=currency_symbol)} (~{format_number(value * exchange_rate, suffix=' kr SEK')})"
+    
+    # Choose the formatter once rather than re-checking per value
+    format_with_sek = format_fx if is_foreign and exchange_rate else format_native
+    
+    # Exchange rate info for foreign stocks, and the description if there is one
+    fx_line = f"\n*Currency: {currency} (1 {currency} ≈ {exchange_rate:.4f} SEK)*" if is_foreign and exchange_rate else ""
+    about = f"\n\n**About:**\n{data['description'][:300]}..." if data.get("description") else ""
+    
+    return _STOCK_TEMPLATE.format_map({
+        "name": data.get("name", data["ticker"]),
+        "ticker": data["ticker"],
+        "exchange": data.get("exchange", "N/A"),
+        "sector": data.get("sector", "N/A"),
+        "fx_line": fx_line,
+        "price": format_with_sek(data.get("price")),
+        "market_cap": format_with_sek(data.get("market_cap")),
+        "pe_ratio": format_number(data.get("pe_ratio")),
+        "forward_pe": format_number(data.get("forward_pe")),
+        "dividend_yield": format_number(data.get("dividend_yield"), suffix="%") if data.get("dividend_yield") else "N/A",
+        "high_52w": format_with_sek(data.get("52_week_high")),
+        "low_52w": format_with_sek(data.get("52_week_low")),
+        "avg_50d": format_with_sek(data.get("50_day_avg")),
+        "avg_200d": format_with_sek(data.get("200_day_avg")),
+        "volume": format_number(data.get("volume")),
+        "avg_volume": format_number(data.get("avg_volume")),
+        "about": about,
+    })
 
 
 @tool
@@ -210,8 +404,63 @@ def get_stock_data(company_or_ticker: str) -> str:
     """
     # Resolve company name to ticker if needed
     ticker = resolve_ticker(company_or_ticker)
-    data = get_stock_info(ticker)
-    return format_stock_data(data)
+    
+    # For foreign listings, fetch the exchange rate alongside the quote rather than after it
+    currency = guess_currency(ticker)
+    if currency in (None, "SEK"):
+        return format_stock_data(get_stock_info(ticker))
+    
+    info_future = _EXECUTOR.submit(get_stock_info, ticker)
+    rate_future = _EXECUTOR.submit(get_exchange_rate_to_sek, currency)
+    data = info_future.result()
+    
+    # A wrong guess leaves the lookup to format_stock_data
+    rate = rate_future.result() if data.get("currency") == currency else None
+    return format_stock_data(data, exchange_rate=rate)
+
+
+@tool
+def get_stock_data_batch(companies: str) -> str:
+    """
+    Fetch real-time stock market data for several companies in one call.
+    Use this instead of repeated get_stock_data calls when comparing stocks.
+    At most 10 companies are fetched per call; any beyond that are listed
+    as skipped and can be requested in a follow-up call.
+    
+    Args:
+        companies: Comma-separated company names OR ticker symbols, e.g.
+            "Volvo, Ericsson, ABB" or "VOLV-B.ST, AAPL, 7203.T"
+    
+    Returns:
+        Formatted stock data for each company, in the order given.
+    """
+    tickers = list(dict.fromkeys(
+        resolve_ticker(name.strip()) for name in companies.split(",") if name.strip()
+    ))
+    if not tickers:
+        return "No companies given. Provide a comma-separated list of names or tickers."
+    
+    tickers, skipped = tickers[:MAX_BATCH_TICKERS], tickers[MAX_BATCH_TICKERS:]
+    
+    # Yahoo has no batch endpoint for quote details, so fetch them concurrently,
+    # together with one exchange rate per foreign currency the tickers imply
+    currencies = {guess_currency(t) for t in tickers} - {None, "SEK"}
+    rate_futures = {c: _EXECUTOR.submit(get_exchange_rate_to_sek, c) for c in currencies}
+    info_futures = [_EXECUTOR.submit(get_stock_info, t) for t in tickers]
+    
+    results = []
+    for future in info_futures:
+        data = future.result()
+        rate_future = rate_futures.get(data.get("currency"))
+        rate = rate_future.result() if rate_future else None
+        results.append(format_stock_data(data, exchange_rate=rate))
+    
+    if skipped:
+        results.append(
+            f"Skipped {len(skipped)} ticker(s) over the limit of {MAX_BATCH_TICKERS} per call: "
+            f"{', '.join(skipped)}. Request them in another call."
+        )
+    return "\n\n---\n\n".join(results)
 
 
 @tool
@@ -234,18 +483,18 @@ def get_historical_stock_data(company_or_ticker: str, period: str = "1mo", date:
         Historical stock prices with open, high, low, close, volume.
         Foreign stocks show both native currency and SEK equivalent.
     """
+    if yf is None and yfc is None:
+        return "yfinance not installed. Run: pip install yfinance"
+    
     try:
-        import yfinance as yf
-        from datetime import datetime, timedelta
-        
         # Resolve company name to ticker
         ticker = resolve_ticker(company_or_ticker)
-        stock = yf.Ticker(ticker)
+        stock = _get_ticker(ticker)
         
-        # Get stock info for currency
-        info = stock.info
-        currency = info.get("currency", "SEK")
-        stock_name = info.get("longName", info.get("shortName", ticker))
+        # Only the currency is needed here, so use the light fast_info endpoint
+        # rather than the full info scrape; name the stock as the user did
+        currency = _fast_info_value(stock.fast_info, "currency") or "SEK"
+        stock_name = company_or_ticker.strip() or ticker
         
         # Handle specific date request
         if date:
@@ -253,21 +502,13 @@ def get_historical_stock_data(company_or_ticker: str, period: str = "1mo", date:
             parsed_date = None
             
             # Try different date formats
-            date_formats = [
-                "%Y-%m-%d",  # 2024-12-15
-                "%Y-%m",     # 2024-12
-                "%B %Y",     # December 2024
-                "%b %Y",     # Dec 2024
-                "%Y/%m/%d",  # 2024/12/15
-                "%d-%m-%Y",  # 15-12-2024
-            ]
-            
-            for fmt in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date, fmt)
+            for pattern, fmt in DATE_PATTERNS:
+                if pattern.match(date):
+                    try:
+                        parsed_date = datetime.strptime(date, fmt)
+                    except ValueError:
+                        pass  # Right shape but not a real date, e.g. 2024-13-01
                     break
-                except ValueError:
-                    continue
             
             # Handle month-year format (get the whole month)
             if parsed_date:
@@ -288,10 +529,10 @@ def get_historical_stock_data(company_or_ticker: str, period: str = "1mo", date:
                                     end=end_date.strftime("%Y-%m-%d"))
             else:
                 # Couldn't parse date, use period instead
-                hist = stock.history(period=period)
+                hist = _history(stock, PRICE_MAX_AGE, period=period)
         else:
             # Use period
-            hist = stock.history(period=period)
+            hist = _history(stock, PRICE_MAX_AGE, period=period)
         
         if hist.empty:
             return f"No historical data found for {ticker}"
@@ -302,11 +543,7 @@ def get_historical_stock_data(company_or_ticker: str, period: str = "1mo", date:
         if is_foreign:
             exchange_rate = get_exchange_rate_to_sek(currency)
         
-        currency_symbol = {
-            "SEK": "kr ", "NOK": "kr ", "DKK": "kr ",
-            "EUR": "€", "USD": "$", "JPY": "¥", "GBP": "£",
-            "CHF": "CHF ", "CNY": "¥", "HKD": "HK$", "KRW": "₩",
-        }.get(currency, currency + " ")
+        currency_symbol = CURRENCY_SYMBOLS.get(currency, currency + " ")
         
         def format_price(price):
             if is_foreign and exchange_rate:
@@ -314,58 +551,55 @@ def get_historical_stock_data(company_or_ticker: str, period: str = "1mo", date:
                 return f"{currency_symbol}{price:,.2f} (~{sek_price:,.2f} kr SEK)"
             return f"{currency_symbol}{price:,.2f}"
         
-        # Build response
-        lines = [
-            f"**Historical Stock Data: {stock_name}** ({ticker})",
-            f"Currency: {currency}" + (f" (1 {currency} ≈ {exchange_rate:.4f} SEK)" if is_foreign and exchange_rate else ""),
-            ""
-        ]
-        
-        # Show summary stats
-        lines.extend([
-            "**Period Summary:**",
-            f"  • Start: {hist.index[0].strftime('%Y-%m-%d')} - Close: {format_price(hist['Close'].iloc[0])}",
-            f"  • End: {hist.index[-1].strftime('%Y-%m-%d')} - Close: {format_price(hist['Close'].iloc[-1])}",
-            f"  • Period High: {format_price(hist['High'].max())}",
-            f"  • Period Low: {format_price(hist['Low'].min())}",
-            f"  • Avg Volume: {hist['Volume'].mean():,.0f}",
-            ""
-        ])
+        # Work on the underlying arrays to skip pandas indexing overhead
+        closes = hist['Close'].to_numpy()
+        volumes = hist['Volume'].to_numpy()
+        start_price = closes[0]
+        end_price = closes[-1]
         
         # Calculate change
-        start_price = hist['Close'].iloc[0]
-        end_price = hist['Close'].iloc[-1]
         change = end_price - start_price
         change_pct = (change / start_price) * 100
         change_symbol = "📈" if change >= 0 else "📉"
         
-        lines.append(f"**Change:** {change_symbol} {format_price(abs(change))} ({change_pct:+.2f}%)")
-        lines.append("")
-        
         # Show recent data points (last 10 or all if less)
         num_rows = min(10, len(hist))
-        lines.append(f"**Recent Prices (last {num_rows} trading days):**")
+        recent = zip(
+            hist.index[-num_rows:].strftime('%Y-%m-%d'),
+            closes[-num_rows:],
+            volumes[-num_rows:]
+        )
         
-        for idx in hist.tail(num_rows).itertuples():
-            date_str = idx.Index.strftime('%Y-%m-%d')
-            lines.append(f"  • {date_str}: {format_price(idx.Close)} (Vol: {idx.Volume:,.0f})")
-        
-        return "\n".join(lines)
+        # Build response
+        return "\n".join([
+            f"**Historical Stock Data: {stock_name}** ({ticker})",
+            f"Currency: {currency}" + (f" (1 {currency} ≈ {exchange_rate:.4f} SEK)" if is_foreign and exchange_rate else ""),
+            "",
+            "**Period Summary:**",
+            f"  • Start: {hist.index[0].strftime('%Y-%m-%d')} - Close: {format_price(start_price)}",
+            f"  • End: {hist.index[-1].strftime('%Y-%m-%d')} - Close: {format_price(end_price)}",
+            f"  • Period High: {format_price(hist['High'].to_numpy().max())}",
+            f"  • Period Low: {format_price(hist['Low'].to_numpy().min())}",
+            f"  • Avg Volume: {volumes.mean():,.0f}",
+            "",
+            f"**Change:** {change_symbol} {format_price(abs(change))} ({change_pct:+.2f}%)",
+            "",
+            f"**Recent Prices (last {num_rows} trading days):**",
+            *(f"  • {date_str}: {format_price(close)} (Vol: {volume:,.0f})" for date_str, close, volume in recent),
+        ])
         
-    except ImportError:
-        return "yfinance not installed. Run: pip install yfinance"
     except Exception as e:
         return f"Error fetching historical data: {str(e)}"
 
 
 def create_stock_tool():
     """Create the stock data tools for agent use."""
-    return [get_stock_data, get_historical_stock_data]
+    return [get_stock_data, get_stock_data_batch, get_historical_stock_data]
 
 
 # Common ticker mappings for convenience
 # Swedish stocks use .ST suffix (Stockholm Stock Exchange)
-COMMON_TICKERS = {
+COMMON_TICKERS = MappingProxyType({
     # Swedish companies (OMX Stockholm - Nasdaq Stockholm)
     "volvo": "VOLV-B.ST",
     "ericsson": "ERIC-B.ST",
@@ -486,9 +720,37 @@ COMMON_TICKERS = {
     "mercedes": "MBG.DE",
     "siemens": "SIE.DE",
     "sap": "SAP.DE",
-}
+})
+
+
+# Word -> ticker for every word of every known name (first name listed wins)
+_TOKEN_INDEX = {}
+for _name, _ticker in COMMON_TICKERS.items():
+    for _word in _name.split():
+        _TOKEN_INDEX.setdefault(_word, _ticker)
+del _name, _ticker, _word
+_MAX_NAME_WORDS = max(len(name.split()) for name in COMMON_TICKERS)
+
+# Names in sorted order, for prefix lookups with bisect
+_SORTED_NAMES = tuple(sorted(COMMON_TICKERS))
 
+# One alternation over every known name, longest first, so a single regex
+# scan finds the names contained in a query
+_NAME_RE = re.compile("|".join(map(re.escape, sorted(COMMON_TICKERS, key=len, reverse=True))))
 
+# All names in one string with their start offsets, so a query contained in
+# a name is found with one str.find and mapped back with bisect
+_BLOB_NAMES = tuple(COMMON_TICKERS)
+_NAME_BLOB = "\n".join(_BLOB_NAMES)
+_NAME_OFFSETS = []
+_offset = 0
+for _name in _BLOB_NAMES:
+    _NAME_OFFSETS.append(_offset)
+    _offset += len(_name) + 1
+del _name, _offset
+
+
+@lru_cache(maxsize=512)
 def resolve_ticker(name_or_ticker: str) -> str:
     """
     Resolve a company name to its ticker symbol.
@@ -505,14 +767,36 @@ def resolve_ticker(name_or_ticker: str) -> str:
         return name_or_ticker
     
     # Try to find in common tickers
-    name_lower = name_or_ticker.lower().strip()
+    name_lower = " ".join(name_or_ticker.lower().split())
     if name_lower in COMMON_TICKERS:
         return COMMON_TICKERS[name_lower]
     
-    # Try partial match
-    for name, ticker in COMMON_TICKERS.items():
-        if name_lower in name or name in name_lower:
-            return ticker
+    # Known names appearing as whole words in the query, longest phrase first
+    words = name_lower.split()
+    for size in range(min(len(words), _MAX_NAME_WORDS), 0, -1):
+        for start in range(len(words) - size + 1):
+            phrase = " ".join(words[start:start + size])
+            if phrase in COMMON_TICKERS:
+                return COMMON_TICKERS[phrase]
+    
+    # A single word of a known name, e.g. "copco" for "atlas copco"
+    if name_lower in _TOKEN_INDEX:
+        return _TOKEN_INDEX[name_lower]
+    
+    # A known name starting with the query, e.g. "hennes" or "novo nor"
+    i = bisect_left(_SORTED_NAMES, name_lower)
+    if i < len(_SORTED_NAMES) and _SORTED_NAMES[i].startswith(name_lower):
+        return COMMON_TICKERS[_SORTED_NAMES[i]]
+    
+    # Known names inside the query, e.g. "volvoab"; the longest wins
+    matches = _NAME_RE.findall(name_lower)
+    if matches:
+        return COMMON_TICKERS[max(matches, key=len)]
+    
+    # The query inside a known name
+    pos = _NAME_BLOB.find(name_lower)
+    if pos >= 0 and "\n" not in name_lower:
+        return COMMON_TICKERS[_BLOB_NAMES[bisect_right(_NAME_OFFSETS, pos) - 1]]
     
     # Default: assume Swedish stock, try with .ST suffix
     # This helps with Swedish company names not in our list
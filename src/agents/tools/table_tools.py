@@ -1,11 +1,27 @@
 """
 Table query tools for structured data retrieval.
 """
-from typing import Optional, List, Type
+from typing import Optional, List, Type, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+import io
+import re
+
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
 
+# Keywords that mark a table as a given type, found anywhere in its headers or content
+TABLE_TYPE_PATTERNS = {
+    "holdings": re.compile("holding|company|stock|weight|portfolio", re.IGNORECASE),
+    "performance": re.compile("return|performance|ytd|benchmark", re.IGNORECASE),
+    "sector_allocation": re.compile("sector|industry|allocation", re.IGNORECASE),
+    "risk_metrics": re.compile("risk|volatility|sharpe|drawdown", re.IGNORECASE),
+}
+
+# Most documents a single comparison covers
+MAX_COMPARE_DOCS = 5
+
+
 class TableQueryInput(BaseModel):
     """Input for table query tool."""
     table_type: str = Field(
@@ -49,62 +65,45 @@ class TableQueryTool(BaseTool):
         if query:
             search_query = f"{table_type}: {query}"
         
+        # Only table chunks are candidates, so let the store filter them out
         results = self.vector_store.search(
             query=search_query,
             n_results=10,
-            filter_doc_id=doc_id
+            filter_doc_id=doc_id,
+            where={"type": "table"}
         )
         
         # Filter for table type
+        pattern = TABLE_TYPE_PATTERNS.get(table_type)
         table_chunks = []
         for result in results:
             metadata = result.get("metadata", {})
-            chunk_type = metadata.get("type", "")
             
-            if chunk_type == "table":
-                # Check if table matches requested type
-                content_lower = result["content"].lower()
-                headers = metadata.get("headers", [])
-                headers_str = " ".join(str(h).lower() for h in headers)
-                
-                if table_type == "all":
-                    table_chunks.append(result)
-                elif table_type == "holdings" and any(
-                    kw in headers_str or kw in content_lower 
-                    for kw in ["holding", "company", "stock", "weight", "portfolio"]
-                ):
-                    table_chunks.append(result)
-                elif table_type == "performance" and any(
-                    kw in headers_str or kw in content_lower 
-                    for kw in ["return", "performance", "ytd", "benchmark"]
-                ):
-                    table_chunks.append(result)
-                elif table_type == "sector_allocation" and any(
-                    kw in headers_str or kw in content_lower 
-                    for kw in ["sector", "industry", "allocation"]
-                ):
-                    table_chunks.append(result)
-                elif table_type == "risk_metrics" and any(
-                    kw in headers_str or kw in content_lower 
-                    for kw in ["risk", "volatility", "sharpe", "drawdown"]
-                ):
+            # Check if table matches requested type
+            if table_type == "all":
+                table_chunks.append(result)
+            elif pattern is not None:
+                headers_str = " ".join(map(str, metadata.get("headers", [])))
+                if pattern.search(headers_str) or pattern.search(result["content"]):
                     table_chunks.append(result)
         
         if not table_chunks:
             return f"No {table_type} tables found."
         
         # Format results
-        formatted = [f"Found {len(table_chunks)} {table_type} table(s):\n"]
+        buf = io.StringIO()
+        write = buf.write
+        write(f"Found {len(table_chunks)} {table_type} table(s):\n")
         
         for i, chunk in enumerate(table_chunks[:5], 1):
             metadata = chunk.get("metadata", {})
             source = metadata.get("doc_id", "Unknown")
             page = metadata.get("page", "?")
             
-            formatted.append(f"\n[Table {i}] (Source: {source}, Page: {page})")
-            formatted.append(chunk["content"])
+            write(f"\n\n[Table {i}] (Source: {source}, Page: {page})\n")
+            write(chunk["content"])
         
-        return "\n".join(formatted)
+        return buf.getvalue()
     
     async def _arun(
         self, 
@@ -143,43 +142,55 @@ class CompareDocumentsTool(BaseTool):
         self.vector_store = vector_store
         self.document_store = document_store
     
+    def _compare_entry(self, doc_id: str, metric: str) -> Optional[Dict[str, Any]]:
+        """Look up one document and its chunks relevant to the metric."""
+        doc_info = self.document_store.get_document(doc_id)
+        if not doc_info:
+            return None
+        
+        # Get relevant data
+        results = self.vector_store.search(
+            query=f"{metric} data",
+            n_results=3,
+            filter_doc_id=doc_id
+        )
+        
+        return {
+            "doc_id": doc_id,
+            "fund_name": doc_info.get("fund_name", "Unknown"),
+            "period": doc_info.get("report_period", "Unknown"),
+            "data": "\n".join(r["content"][:500] for r in results)
+        }
+    
     def _run(self, doc_ids: List[str], metric: str) -> str:
         """Compare documents."""
-        comparisons = []
+        doc_ids = doc_ids[:MAX_COMPARE_DOCS]
+        if not doc_ids:
+            return "No documents found for comparison."
         
-        for doc_id in doc_ids[:5]:  # Limit to 5 documents
-            doc_info = self.document_store.get_document(doc_id)
-            if not doc_info:
-                continue
-            
-            # Get relevant data
-            results = self.vector_store.search(
-                query=f"{metric} data",
-                n_results=3,
-                filter_doc_id=doc_id
-            )
-            
-            doc_data = {
-                "doc_id": doc_id,
-                "fund_name": doc_info.get("fund_name", "Unknown"),
-                "period": doc_info.get("report_period", "Unknown"),
-                "data": "\n".join(r["content"][:500] for r in results)
-            }
-            comparisons.append(doc_data)
+        # Every search uses the same query; embed it once before fanning out
+        self.vector_store.embed_query(f"{metric} data")
+        
+        # The per-document lookups are independent I/O, so run them concurrently
+        with ThreadPoolExecutor(max_workers=len(doc_ids)) as executor:
+            entries = executor.map(lambda doc_id: self._compare_entry(doc_id, metric), doc_ids)
+            comparisons = [entry for entry in entries if entry]
         
         if not comparisons:
             return "No documents found for comparison."
         
         # Format comparison
-        output = [f"Comparison of {metric} across {len(comparisons)} documents:\n"]
+        buf = io.StringIO()
+        write = buf.write
+        write(f"Comparison of {metric} across {len(comparisons)} documents:\n")
         
         for comp in comparisons:
-            output.append(f"\n## {comp['fund_name']} ({comp['period']})")
-            output.append(f"Document ID: {comp['doc_id']}")
-            output.append(comp['data'][:1000])
-            output.append("\n---")
+            write(f"\n\n## {comp['fund_name']} ({comp['period']})\n")
+            write(f"Document ID: {comp['doc_id']}\n")
+            write(comp['data'][:1000])
+            write("\n\n---")
         
-        return "\n".join(output)
+        return buf.getvalue()
     
     async def _arun(self, doc_ids: List[str], metric: str) -> str:
         """Async execution."""
@@ -2,20 +2,197 @@
 URL content fetching tool for agent - uses Playwright for JS-rendered pages.
 No storage - just fetches and returns content for immediate use.
 """
-import warnings
+import atexit
+import collections
+import hashlib
+import json
 import logging
-from typing import Type
+import queue
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Optional, Type
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+try:
+    import trafilatura
+except ImportError:
+    trafilatura = None
+
+try:
+    import html2text
+except ImportError:
+    html2text = None
+
 # Suppress warnings
 warnings.filterwarnings("ignore", message="Token indices sequence length")
 logging.getLogger("transformers").setLevel(logging.ERROR)
 
+# Seconds to wait for one page before giving up on the worker
+FETCH_TIMEOUT = 90
+
+# Lines of worker stderr kept for the error message when it exits
+STDERR_TAIL_LINES = 50
+
+# Extracted text shorter than this is treated as a failed extraction
+MIN_CONTENT_CHARS = 100
+
+# How long fetched page content is reused from the on-disk cache
+URL_CACHE_SECONDS = 3600
+
+# Playwright runs in a child process to stay clear of Streamlit's event loop.
+# The child launches Chromium once and opens every page in one browser
+# context. It reads JSON-encoded URLs from stdin and writes one JSON result
+# per line to stdout.
+WORKER_SCRIPT = '''
+import sys
+import json
+from playwright.sync_api import sync_playwright
+
+with sync_playwright() as p:
+    browser = p.chromium.launch(headless=True)
+    # One context for all pages so cookies, cache and connections carry over
+    context = browser.new_context()
+    try:
+        for line in sys.stdin:
+            url = json.loads(line)
+            page = context.new_page()
+            try:
+                page.goto(url, wait_until="networkidle", timeout=30000)
+                page.wait_for_timeout(2000)
+                result = {"html": page.content()}
+            except Exception as e:
+                result = {"error": str(e)}
+            finally:
+                page.close()
+            sys.stdout.write(json.dumps(result) + "\\n")
+            sys.stdout.flush()
+    finally:
+        browser.close()
+'''
+
+
+class _BrowserWorker:
+    """Long-lived Playwright subprocess shared by all URL fetch tools."""
+    
+    def __init__(self):
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr: "collections.deque[str]" = collections.deque(maxlen=STDERR_TAIL_LINES)
+        self._stderr_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        atexit.register(self._stop)
+    
+    def _start(self) -> None:
+        """Spawn the worker and threads that drain its stdout and stderr."""
+        self._proc = subprocess.Popen(
+            [sys.executable, "-c", WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace"
+        )
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._pump, args=(self._proc, self._lines), daemon=True
+        ).start()
+        
+        # Browser logs go to stderr; keep reading it so the pipe never fills
+        # and blocks the worker, but only remember the tail
+        self._stderr = collections.deque(maxlen=STDERR_TAIL_LINES)
+        self._stderr_thread = threading.Thread(
+            target=self._stderr.extend, args=(self._proc.stderr,), daemon=True
+        )
+        self._stderr_thread.start()
+    
+    @staticmethod
+    def _pump(proc: subprocess.Popen, lines: queue.Queue) -> None:
+        """Forward stdout lines to the queue; None marks the end of output."""
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+    
+    def _stop(self) -> None:
+        """Kill the worker so the next fetch starts a fresh one."""
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc = None
+    
+    def fetch(self, url: str, timeout: float = FETCH_TIMEOUT) -> dict:
+        """
+        Render a URL and return {"html": ...} or {"error": ...}.
+        
+        Raises:
+            subprocess.TimeoutExpired: if the page takes longer than timeout
+        """
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            
+            try:
+                self._proc.stdin.write(json.dumps(url) + "\n")
+                self._proc.stdin.flush()
+                line = self._lines.get(timeout=timeout)
+            except OSError:
+                line = None
+            except queue.Empty:
+                self._stop()
+                raise subprocess.TimeoutExpired(url, timeout)
+            
+            if line is None:
+                # Worker exited, e.g. Playwright or Chromium is missing
+                proc = self._proc
+                self._proc = None
+                proc.kill()
+                proc.wait()
+                self._stderr_thread.join(timeout=1)
+                return {"error": "".join(self._stderr).strip() or "browser worker exited"}
+            return json.loads(line)
+
+
+_WORKER = _BrowserWorker()
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    Convert a page to markdown.
+    
+    trafilatura keeps only the main content (no navigation, footers, etc.);
+    if it finds too little, the whole page is converted with html2text.
+    """
+    if trafilatura is not None:
+        markdown = trafilatura.extract(
+            html,
+            output_format="markdown",
+            include_links=True,
+            include_tables=True,
+            favor_precision=True
+        )
+        if markdown and len(markdown.strip()) > MIN_CONTENT_CHARS:
+            return markdown
+    
+    if html2text is None:
+        return ""
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    h.body_width = 0
+    return h.handle(html)
+
 
 class FetchURLInput(BaseModel):
     """Input for URL fetch tool."""
     url: str = Field(description="The URL to fetch and extract content from")
+    force_refresh: bool = Field(
+        default=False,
+        description="Fetch the page again even if it was fetched recently"
+    )
 
 
 class FetchURLContentTool(BaseTool):
@@ -26,7 +203,10 @@ class FetchURLContentTool(BaseTool):
     - Uses headless browser to render JavaScript
     - Extracts full dynamic content
     - Returns clean markdown
-    - Does NOT store anything (one-time use)
+    - Does NOT add anything to the document store (one-time use)
+    
+    If cache_dir is set, extracted content is kept on disk for cache_ttl
+    seconds, so repeated lookups of a URL skip the browser.
     """
     
     name: str = "fetch_url_content"
@@ -39,62 +219,36 @@ class FetchURLContentTool(BaseTool):
     Call this tool with the URL to get the page content, then answer their question."""
     args_schema: Type[BaseModel] = FetchURLInput
     
-    def __init__(self):
+    cache_dir: Optional[Path] = None
+    cache_ttl: float = URL_CACHE_SECONDS
+    
+    def __init__(self, cache_dir: Optional[str] = None):
         super().__init__()
+        if cache_dir:
+            self.cache_dir = Path(cache_dir)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
     
-    def _run(self, url: str) -> str:
-        """Fetch URL content using Playwright in a subprocess (avoids event loop issues)."""
-        import subprocess
-        import sys
-        import json
-        import tempfile
-        import os
-        
-        try:
-            import html2text
-        except ImportError:
-            return "Error: html2text is required for URL extraction."
+    def _cache_path(self, url: str) -> Optional[Path]:
+        """Path of the cache file for a URL, or None if caching is off."""
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.md"
+    
+    def _run(self, url: str, force_refresh: bool = False) -> str:
+        """Fetch URL content using the shared Playwright worker process."""
+        if trafilatura is None and html2text is None:
+            return "Error: trafilatura or html2text is required for URL extraction."
         
-        # Create a temporary script to run Playwright in isolation
-        script = '''
-import sys
-import json
-from playwright.sync_api import sync_playwright
-
-url = sys.argv[1]
-
-with sync_playwright() as p:
-    browser = p.chromium.launch(headless=True)
-    page = browser.new_page()
-    try:
-        page.goto(url, wait_until="networkidle", timeout=30000)
-        page.wait_for_timeout(2000)
-        html = page.content()
-        print(json.dumps({"html": html}))
-    except Exception as e:
-        print(json.dumps({"error": str(e)}))
-    finally:
-        browser.close()
-'''
-        # Write script to temp file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(script)
-            script_path = f.name
+        cache_path = self._cache_path(url)
+        if cache_path is not None and not force_refresh:
+            try:
+                if time.time() - cache_path.stat().st_mtime < self.cache_ttl:
+                    return cache_path.read_text(encoding="utf-8")
+            except OSError:
+                pass
         
         try:
-            # Run in subprocess to completely isolate from Streamlit's event loop
-            result = subprocess.run(
-                [sys.executable, script_path, url],
-                capture_output=True,
-                text=True,
-                timeout=90
-            )
-            
-            if result.returncode != 0:
-                return f"Error fetching URL {url}: {result.stderr}"
-            
-            # Parse the JSON output
-            output = json.loads(result.stdout.strip())
+            output = _WORKER.fetch(url)
             
             if "error" in output:
                 return f"Error fetching URL {url}: {output['error']}"
@@ -105,32 +259,29 @@ with sync_playwright() as p:
             return f"Error: Timeout while fetching URL {url}"
         except Exception as e:
             return f"Error fetching URL {url}: {str(e)}"
-        finally:
-            try:
-                os.unlink(script_path)
-            except:
-                pass
         
         # Convert HTML to markdown
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.body_width = 0
-        markdown = h.handle(html_content)
+        markdown = html_to_markdown(html_content)
         
-        if markdown and len(markdown.strip()) > 100:
+        if markdown and len(markdown.strip()) > MIN_CONTENT_CHARS:
             # Truncate if too long
             if len(markdown) > 15000:
                 markdown = markdown[:15000] + "\n\n... [Content truncated - page is very long]"
-            return f"## Content from {url}\n\n{markdown}"
+            content = f"## Content from {url}\n\n{markdown}"
+            if cache_path is not None:
+                try:
+                    cache_path.write_text(content, encoding="utf-8")
+                except OSError as e:
+                    print(f"Could not write URL cache entry: {e}")
+            return content
         
         return f"Could not extract meaningful content from URL: {url}"
     
-    async def _arun(self, url: str) -> str:
+    async def _arun(self, url: str, force_refresh: bool = False) -> str:
         """Async execution."""
-        return self._run(url)
+        return self._run(url, force_refresh)
 
 
-def create_url_fetch_tool() -> FetchURLContentTool:
-    """Create URL fetch tool."""
-    return FetchURLContentTool()
+def create_url_fetch_tool(cache_dir: Optional[str] = None) -> FetchURLContentTool:
+    """Create URL fetch tool, optionally caching fetched pages under cache_dir."""
+    return FetchURLContentTool(cache_dir=cache_dir)
@@ -29,7 +29,7 @@ from extractors.table_extractor import TableExtractor
 from extractors.image_extractor import ImageExtractor
 from extractors.metadata_extractor import MetadataExtractor
 from agents.comment_agent import CommentGeneratorAgent
-from agents.document_analyzer import DocumentAnalyzerAgent
+from agents.document_analyzer import DocumentAnalyzerAgent, MAX_PROMPT_TABLES, MAX_PROMPT_ROWS
 from agents.chart_analyzer import ChartAnalyzer
 from models.extracted_data import (
     ExtractedData, 
@@ -289,12 +289,7 @@ def delete_document(doc_id: str):
                     for source_id in source_ids:
                         try:
                             # Delete chunks by source_id metadata
-                            results = vec_store.collection.get(
-                                where={"source_id": source_id},
-                                include=[]
-                            )
-                            if results["ids"]:
-                                vec_store.collection.delete(ids=results["ids"])
+                            vec_store.delete_where({"source_id": source_id})
                         except Exception:
                             pass
                 print(f"Deleted {count} secondary source(s) for document {doc_id}")
@@ -631,7 +626,8 @@ def render_chat_view():
             model_name=config.GEMINI_MODEL,
             provider="gemini",
             vector_store=vec_store,
-            document_store=doc_store
+            document_store=doc_store,
+            url_cache_dir=str(config.DATA_DIR / "cache" / "url_content")
         )
     agent = st.session_state.chat_agent
     
@@ -735,18 +731,20 @@ def render_generate_view():
             # Run document analyzer agent
             analyzer = DocumentAnalyzerAgent(
                 api_key=config.GEMINI_API_KEY,
-                model_name=config.GEMINI_MODEL
+                model_name=config.GEMINI_MODEL,
+                cache_dir=str(config.DATA_DIR / "cache" / "document_analyses")
             )
             
-            # Convert tables for analyzer
-            tables_for_analysis = []
-            for table in extracted_data.raw_tables:
-                tables_for_analysis.append({
+            # Convert tables for analyzer, keeping only the rows its prompt uses
+            tables_for_analysis = [
+                {
                     "page": table.page,
                     "headers": table.headers,
-                    "rows": table.rows,
+                    "rows": table.rows[:MAX_PROMPT_ROWS],
                     "type": table.table_type
-                })
+                }
+                for table in extracted_data.raw_tables[:MAX_PROMPT_TABLES]
+            ]
             
             document_analysis = analyzer.analyze_document(
                 raw_text=extracted_data.raw_text or "",
@@ -826,7 +824,8 @@ def render_generate_view():
                             model_name=config.GEMINI_MODEL,
                             provider="gemini",
                             vector_store=vec_store,
-                            document_store=doc_store
+                            document_store=doc_store,
+                            url_cache_dir=str(config.DATA_DIR / "cache" / "url_content")
                         )
                         
                         # Build context from selections
@@ -1238,7 +1237,8 @@ def _extract_pdf_data(pdf_bytes: bytes) -> ExtractedData:
         try:
             chart_analyzer = ChartAnalyzer(
                 api_key=config.GEMINI_API_KEY,
-                model_name=config.GEMINI_FLASH_MODEL
+                model_name=config.GEMINI_FLASH_MODEL,
+                cache_dir=str(config.DATA_DIR / "cache" / "chart_analyses")
             )
             fund_context = f"Fund: {metadata.get('fund_name', 'Unknown')}, Period: {metadata.get('report_period', 'Unknown')}"
             chart_descriptions = chart_analyzer.analyze_multiple_charts(images, fund_context)
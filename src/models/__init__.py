@@ -2,6 +2,7 @@
 from .extracted_data import ExtractedData, PerformanceData, HoldingData, SectorData
 from .comment_params import CommentParameters
 from .secondary_source import SecondarySource, SourceType
+from .document_analysis import DocumentAnalysisSchema
 
 __all__ = [
     "ExtractedData",
@@ -10,5 +11,6 @@ __all__ = [
     "SectorData",
     "CommentParameters",
     "SecondarySource",
-    "SourceType"
+    "SourceType",
+    "DocumentAnalysisSchema"
 ]
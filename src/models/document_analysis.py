@@ -0,0 +1,93 @@
+"""
+Pydantic models for the document analysis returned by DocumentAnalyzerAgent.
+"""
+from typing import Any, List, Optional
+from pydantic import BaseModel, ConfigDict
+
+
+class _AnalysisItem(BaseModel):
+    """
+    Base for analysis entries; the LLM may add extra fields.
+    
+    Numbers are accepted for text fields, since the model often answers
+    e.g. "page_hint": 3 or "period": 2024.
+    """
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+
+class FundInfo(_AnalysisItem):
+    """Fund-level information."""
+    name: Optional[str] = None
+    benchmark: Optional[str] = None
+    currency: Optional[str] = None
+    report_period: Optional[str] = None
+    report_type: Optional[str] = None
+
+
+class AnalysisSection(_AnalysisItem):
+    """A section of the document."""
+    id: Optional[str] = None
+    title: Optional[str] = None
+    type: Optional[str] = None
+    summary: Optional[str] = None
+    page_hint: Optional[str] = None
+
+
+class AnalysisTable(_AnalysisItem):
+    """A table found in the document."""
+    id: Optional[str] = None
+    title: Optional[str] = None
+    type: Optional[str] = None
+    description: Optional[str] = None
+    key_data: List[Any] = []
+    row_count: Optional[Any] = None
+    include_by_default: bool = True
+
+
+class AnalysisChart(_AnalysisItem):
+    """A chart found in the document."""
+    id: Optional[str] = None
+    title: Optional[str] = None
+    type: Optional[str] = None
+    description: Optional[str] = None
+    include_by_default: bool = True
+
+
+class AnalysisCompany(_AnalysisItem):
+    """A company mentioned in the document."""
+    name: Optional[str] = None
+    context: Optional[str] = None
+    details: Optional[str] = None
+
+
+class AnalysisMetric(_AnalysisItem):
+    """A key metric found in the document."""
+    name: Optional[str] = None
+    value: Optional[Any] = None
+    category: Optional[str] = None
+
+
+class AnalysisTimePeriod(_AnalysisItem):
+    """A time period mentioned in the document."""
+    period: Optional[str] = None
+    type: Optional[str] = None
+
+
+class AnalysisTheme(_AnalysisItem):
+    """A theme discussed in the document."""
+    theme: Optional[str] = None
+    relevance: Optional[str] = None
+    description: Optional[str] = None
+
+
+class DocumentAnalysisSchema(_AnalysisItem):
+    """Structure the document analysis prompt asks the LLM to return."""
+    fund_info: FundInfo = FundInfo()
+    sections: List[AnalysisSection] = []
+    tables: List[AnalysisTable] = []
+    charts: List[AnalysisChart] = []
+    companies: List[AnalysisCompany] = []
+    metrics: List[AnalysisMetric] = []
+    time_periods: List[AnalysisTimePeriod] = []
+    themes: List[AnalysisTheme] = []
+    key_insights: List[str] = []
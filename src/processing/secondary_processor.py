@@ -373,10 +373,8 @@ with sync_playwright() as p:
         # Delete from vector store
         if self.vector_store:
             try:
-                # Get all chunks for this source
-                self.vector_store.collection.delete(
-                    where={"source_id": source_id}
-                )
+                # Delete all chunks for this source
+                self.vector_store.delete_where({"source_id": source_id})
             except Exception as e:
                 print(f"Error deleting embeddings: {e}")
         
@@ -1,7 +1,7 @@
 """
 Document store using SQLite for metadata and file storage.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 import sqlite3
@@ -10,6 +10,13 @@ import hashlib
 import shutil
 
 
+# Columns returned by list_documents (and the whitelist for its projection)
+LIST_COLUMNS = (
+    "id", "filename", "fund_name", "report_period",
+    "page_count", "upload_date", "last_accessed"
+)
+
+
 class DocumentStore:
     """SQLite-based document metadata store with file management."""
     
@@ -249,19 +256,41 @@ class DocumentStore:
     def get_file_bytes(self, doc_id: str) -> Optional[bytes]:
         """Get the original PDF file bytes."""
         doc = self.get_document(doc_id)
-        if doc and Path(doc["file_path"]).exists():
-            with open(doc["file_path"], "rb") as f:
-                return f.read()
+        if doc:
+            try:
+                with open(doc["file_path"], "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
         return None
     
-    def list_documents(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """List all documents, most recent first."""
+    def list_documents(
+        self,
+        limit: int = 50,
+        columns: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        List all documents, most recent first.
+        
+        Args:
+            limit: Maximum number of documents to return
+            columns: Optional subset of LIST_COLUMNS to select, to avoid
+                fetching fields the caller does not need; None or empty
+                selects all of LIST_COLUMNS
+        """
+        if not columns:
+            columns = LIST_COLUMNS
+        else:
+            unknown = set(columns) - set(LIST_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown document columns: {sorted(unknown)}")
+        
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT id, filename, fund_name, report_period, page_count, upload_date, last_accessed
+        cursor.execute(f"""
+            SELECT {", ".join(columns)}
             FROM documents
             ORDER BY last_accessed DESC
             LIMIT ?
@@ -3,6 +3,8 @@ Vector store using ChromaDB for persistent document embeddings.
 """
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+import functools
+
 import chromadb
 from chromadb.config import Settings
 
@@ -30,6 +32,12 @@ class VectorStore:
         # Initialize embedding function
         self.embeddings = GeminiEmbeddings(api_key)
         
+        # Paginated and repeated searches reuse the query embedding instead of calling the API again
+        self.embed_query = functools.lru_cache(maxsize=256)(self.embeddings.embed_query)
+        
+        # Bumped on every add/delete so callers can invalidate cached search results
+        self.version = 0
+        
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
             name=collection_name,
@@ -60,6 +68,12 @@ class VectorStore:
                 if "chunk_index" not in meta:
                     meta["chunk_index"] = i
         
+        # Lowercased forms used by section filtering, computed once here instead of per lookup
+        for chunk, meta in zip(chunks, metadatas):
+            meta["content_head_lc"] = chunk[:200].lower()
+            if meta.get("section_name"):
+                meta["section_name_lc"] = str(meta["section_name"]).lower()
+        
         # Generate embeddings
         embeddings = self.embeddings.embed_documents(chunks)
         
@@ -70,26 +84,41 @@ class VectorStore:
             embeddings=embeddings,
             metadatas=metadatas
         )
+        self.version += 1
     
     def search(
         self,
         query: str,
         n_results: int = 5,
-        filter_doc_id: Optional[str] = None
+        filter_doc_id: Optional[str] = None,
+        offset: int = 0,
+        where: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
+        """
+        Search for similar documents.
+        
+        Returns up to n_results matches starting at rank `offset`. Chroma has
+        no native offset, so the top offset + n_results are queried and the
+        leading ones dropped. `where` holds extra exact-match metadata
+        conditions, e.g. {"type": "table"}.
+        """
         # Generate query embedding
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = self.embed_query(query)
         
-        # Build where filter
-        where_filter = None
+        # Build where filter; Chroma needs $and to combine several fields
+        conditions = dict(where or {})
         if filter_doc_id:
-            where_filter = {"doc_id": filter_doc_id}
+            conditions["doc_id"] = filter_doc_id
+        where_filter = None
+        if len(conditions) == 1:
+            where_filter = conditions
+        elif conditions:
+            where_filter = {"$and": [{k: v} for k, v in conditions.items()]}
         
         # Search
         results = self.collection.query(
             query_embeddings=[query_embedding],
-            n_results=n_results,
+            n_results=offset + n_results,
             where=where_filter,
             include=["documents", "metadatas", "distances"]
         )
@@ -97,7 +126,7 @@ class VectorStore:
         # Format results
         formatted = []
         if results["documents"] and results["documents"][0]:
-            for i, doc in enumerate(results["documents"][0]):
+            for i, doc in enumerate(results["documents"][0][offset:], offset):
                 formatted.append({
                     "content": doc,
                     "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
@@ -125,14 +154,19 @@ class VectorStore:
     
     def delete_document(self, doc_id: str) -> None:
         """Delete all chunks for a document."""
-        # Get all chunk IDs for this document
+        self.delete_where({"doc_id": doc_id})
+    
+    def delete_where(self, where: Dict[str, Any]) -> None:
+        """Delete all chunks whose metadata matches a Chroma where filter."""
+        # Get the matching chunk IDs first so version only changes on a real delete
         results = self.collection.get(
-            where={"doc_id": doc_id},
+            where=where,
             include=[]
         )
         
         if results["ids"]:
             self.collection.delete(ids=results["ids"])
+            self.version += 1
     
     def document_exists(self, doc_id: str) -> bool:
         """Check if a document exists in the store."""
@@ -289,7 +289,8 @@ def get_chat_agent(config, vec_store, doc_store):
             model_name=config.GEMINI_MODEL,
             provider="gemini",
             vector_store=vec_store,
-            document_store=doc_store
+            document_store=doc_store,
+            url_cache_dir=str(config.DATA_DIR / "cache" / "url_content")
         )
     return st.session_state.floating_chat_agent
 
@@ -0,0 +1,7 @@
+"""
+Shared pytest setup: make the application packages under src/ importable.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,29 @@
+"""
+Tests for JSON extraction in DocumentAnalyzerAgent.
+"""
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from agents.document_analyzer import DocumentAnalyzerAgent
+
+
+@pytest.fixture
+def analyzer():
+    # _extract_json needs no model, so skip __init__ and its SDK setup
+    return DocumentAnalyzerAgent.__new__(DocumentAnalyzerAgent)
+
+
+def test_extract_json_skips_bracketed_aside(analyzer):
+    text = 'Note [see p.3]: {"fund_info": {"name": "X"}}'
+    assert analyzer._extract_json(text) == {"fund_info": {"name": "X"}}
+
+
+def test_extract_json_rejects_inner_fragment_of_invalid_object(analyzer):
+    text = 'Here you go: {"fund_info": {"name": "X"}, "sections": [1,],}'
+    assert analyzer._extract_json(text) is None
+
+
+def test_extract_json_strips_code_fence(analyzer):
+    text = '```json\n[{"a": 1}]\n```'
+    assert analyzer._extract_json(text) == [{"a": 1}]
@@ -0,0 +1,40 @@
+"""
+Tests for the stock tools with yfinance-cache style Ticker stubs.
+"""
+import pytest
+
+pytest.importorskip("langchain")
+pd = pytest.importorskip("pandas")
+
+from agents.tools import stock_tools
+
+
+class _DictFastInfoTicker:
+    """Ticker stub whose fast_info is a camelCase dict, as in yfinance-cache."""
+    
+    fast_info = {"currency": "USD", "lastPrice": 190.0}
+    
+    def history(self, **kwargs):
+        index = pd.date_range("2024-12-02", periods=3, freq="D")
+        return pd.DataFrame(
+            {
+                "Close": [100.0, 101.0, 102.0],
+                "High": [103.0, 104.0, 105.0],
+                "Low": [99.0, 100.0, 101.0],
+                "Volume": [1000, 2000, 3000],
+            },
+            index=index,
+        )
+
+
+@pytest.fixture
+def dict_fast_info_ticker(monkeypatch):
+    monkeypatch.setattr(stock_tools, "yf", object())
+    monkeypatch.setattr(stock_tools, "_get_ticker", lambda symbol: _DictFastInfoTicker())
+    monkeypatch.setattr(stock_tools, "get_exchange_rate_to_sek", lambda currency: 10.0)
+
+
+def test_historical_data_reads_currency_from_dict_fast_info(dict_fast_info_ticker):
+    result = stock_tools.get_historical_stock_data.invoke({"company_or_ticker": "AAPL"})
+    assert "Currency: USD (1 USD ≈ 10.0000 SEK)" in result
+    assert "$102.00 (~1,020.00 kr SEK)" in result